@@ -1,20 +1,60 @@
 """Flask application factory."""
 from flask import Flask
+from app import broadcast, cache, events, expiry, ratelimit, rollups, schema, search, sharding
+from app.commands import register_commands
 from app.config import config
 from app.models import db
 
 
-def create_app(config_name='default'):
-    """Create and configure the Flask application."""
+def create_app(config_name='default', test_config=None):
+    """Create and configure the Flask application.
+    
+    Args:
+        config_name: Key of the configuration class in ``app.config.config``
+        test_config: Optional mapping of settings overriding the configuration
+    """
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    if test_config:
+        app.config.update(test_config)
     
     db.init_app(app)
+    events.init_app(app)
+    broadcast.init_app(app)
+    ratelimit.init_app(app)
+    cache.init_app(app)
+    register_commands(app)
     
     from app.routes import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
     
     with app.app_context():
-        db.create_all()
+        # Only the central database; order shards get their tables from sharding.init_app
+        db.create_all(bind_key=None)
+        for change in schema.upgrade(db.engine, db.metadata):
+            app.logger.info('Schema upgrade: added %s', change)
+        search.init_app(app)
+    sharding.init_app(app, db)
+    # After the shards: with sharding the orders to summarise live there
+    rollups.init_app(app)
+    with app.app_context():
+        from app.services import OrderService, ProductService
+        # Items stored before product names were recorded on them
+        backfilled = OrderService.backfill_item_names()
+        if backfilled:
+            app.logger.info('Backfilled product names of %d order items', backfilled)
+        # Products that predate the watchlist or the current default threshold
+        relisted = ProductService.recompute_low_stock()
+        if relisted:
+            app.logger.info('Low-stock watchlist: updated %d products', relisted)
+    expiry.init_app(app)
+    
+    if app.config['GROUP_COMMIT_ENABLED']:
+        from app.group_commit import GroupCommitter
+        GroupCommitter(
+            app,
+            window_ms=app.config['GROUP_COMMIT_WINDOW_MS'],
+            max_batch=app.config['GROUP_COMMIT_MAX_BATCH']
+        ).start()
     
     return app
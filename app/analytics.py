@@ -0,0 +1,275 @@
+"""Columnar snapshots of the orders for ad-hoc analytics.
+
+``write_snapshot`` dumps ``orders`` and ``order_items`` into one NumPy
+``.npy`` file per column, and ``OrderSnapshot`` answers revenue, quantity and
+top-product questions with vectorized operations over those files opened as
+memory maps. Only the columns a question needs are read, and nothing is
+loaded row by row.
+
+Layout of a snapshot directory:
+
+- ``meta.json``: row counts, creation time and the status dictionary
+- ``order_id``, ``order_total``, ``order_created_at`` and ``order_status``
+  (a code into the status dictionary)
+- ``item_order_id``, ``item_quantity``, ``item_subtotal`` and
+  ``item_product`` (a code into ``product_ids.npy``), plus ``item_status``
+  copied from the item's order so item questions need no join
+
+A snapshot is a copy as of the time it was taken; take a new one to see
+later changes. Orders and items are read by two queries, so under write
+traffic the newest orders and items may not line up exactly.
+
+NumPy is an optional dependency, needed only by this module.
+"""
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from app.models import db, Order, OrderItem
+
+SNAPSHOT_VERSION = 1
+
+# Rows fetched from the database per round trip while writing a snapshot
+SNAPSHOT_BATCH_SIZE = 10_000
+
+_ORDER_COLUMNS = {
+    'order_id': 'int64',
+    'order_total': 'float64',
+    'order_created_at': 'datetime64[s]',
+    'order_status': 'uint8',
+}
+_ITEM_COLUMNS = {
+    'item_order_id': 'int64',
+    'item_product_id': 'int64',
+    'item_quantity': 'int32',
+    'item_subtotal': 'float64',
+    'item_status': 'uint8',
+}
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise RuntimeError("Order snapshots need NumPy: pip install numpy") from e
+    return numpy
+
+
+def _count(model):
+    # Sharded sessions return one count per shard
+    return sum(db.session.scalars(select(func.count()).select_from(model)).all())
+
+
+def _fill(np, directory, columns, count, statement, convert):
+    """Stream the rows of ``statement`` into one memory-mapped file per column."""
+    arrays = {
+        name: np.lib.format.open_memmap(
+            os.path.join(directory, f'{name}.npy'), mode='w+', dtype=dtype, shape=(count,)
+        )
+        for name, dtype in columns.items()
+    }
+    position = 0
+    result = db.session.execute(statement.execution_options(yield_per=SNAPSHOT_BATCH_SIZE))
+    for rows in result.partitions():
+        # Rows written since the count was taken are left for the next snapshot
+        rows = rows[:count - position]
+        end = position + len(rows)
+        for name, values in zip(columns, zip(*rows)):
+            arrays[name][position:end] = convert.get(name, np.asarray)(values)
+        position = end
+    for array in arrays.values():
+        array.flush()
+    return position
+
+
+def _truncate(np, directory, columns, count):
+    """Shorten the column files when rows were deleted after they were counted."""
+    for name in columns:
+        file = os.path.join(directory, f'{name}.npy')
+        column = np.load(file, mmap_mode='r')
+        if len(column) != count:
+            values = np.array(column[:count])
+            del column
+            np.save(file, values)
+
+
+def write_snapshot(path):
+    """Write a columnar snapshot of all orders and items to the directory ``path``.
+
+    The snapshot is built next to ``path`` and moved into place when
+    complete, so readers never see a half-written snapshot.
+
+    Returns:
+        Dict with the number of 'orders' and 'items' written
+    """
+    np = _numpy()
+    statuses = list(Order.VALID_STATUSES)
+    status_codes = {status: code for code, status in enumerate(statuses)}
+
+    def encode_status(values):
+        return np.fromiter((status_codes[v] for v in values), dtype='uint8', count=len(values))
+
+    def encode_time(values):
+        return np.array(values, dtype='datetime64[us]').astype('datetime64[s]')
+
+    convert = {
+        'order_status': encode_status, 'item_status': encode_status,
+        'order_created_at': encode_time,
+    }
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix='.snapshot-', dir=parent)
+    try:
+        orders = _fill(
+            np, directory, _ORDER_COLUMNS, _count(Order),
+            select(Order.id, Order.total_amount, Order.created_at, Order.status).order_by(Order.id),
+            convert
+        )
+        items = _fill(
+            np, directory, _ITEM_COLUMNS, _count(OrderItem),
+            select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity,
+                   OrderItem.subtotal, Order.status)
+            .join(Order, OrderItem.order_id == Order.id)
+            .order_by(OrderItem.order_id, OrderItem.id),
+            convert
+        )
+        _truncate(np, directory, _ORDER_COLUMNS, orders)
+        _truncate(np, directory, _ITEM_COLUMNS, items)
+
+        # Dictionary-encode the product ids of the items
+        product_path = os.path.join(directory, 'item_product_id.npy')
+        product_ids, codes = np.unique(np.load(product_path), return_inverse=True)
+        code_type = 'uint16' if len(product_ids) <= np.iinfo('uint16').max + 1 else 'uint32'
+        np.save(os.path.join(directory, 'product_ids.npy'), product_ids)
+        np.save(os.path.join(directory, 'item_product.npy'), codes.astype(code_type))
+        os.remove(product_path)
+
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({
+                'version': SNAPSHOT_VERSION,
+                'created_at': datetime.utcnow().isoformat(),
+                'orders': orders,
+                'items': items,
+                'statuses': statuses,
+            }, f)
+
+        if os.path.isdir(path):
+            old = path + '.old'
+            os.rename(path, old)
+            os.rename(directory, path)
+            shutil.rmtree(old)
+        else:
+            os.rename(directory, path)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return {'orders': orders, 'items': items}
+
+
+class OrderSnapshot:
+    """Read-only analytics over a snapshot written by ``write_snapshot``.
+
+    Columns are opened as memory maps on first use; the operating system
+    pages in only what a question touches.
+    """
+
+    def __init__(self, path):
+        self.np = _numpy()
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {self.meta['version']}")
+        self.statuses = self.meta['statuses']
+        self._columns = {}
+
+    def __getitem__(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            column = self.np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+            self._columns[name] = column
+        return column
+
+    def _status_mask(self, column, statuses):
+        """Boolean mask of the rows whose status is in ``statuses`` (None: all rows)."""
+        if statuses is None:
+            return None
+        codes = [self.statuses.index(status) for status in statuses]
+        return self.np.isin(self[column], codes)
+
+    def revenue_by_status(self):
+        """Order count and revenue per status, like ``ReportService.get_revenue_by_status``."""
+        np = self.np
+        status = self['order_status']
+        counts = np.bincount(status, minlength=len(self.statuses))
+        revenue = np.bincount(status, weights=self['order_total'], minlength=len(self.statuses))
+        return [
+            {'status': name, 'order_count': int(counts[code]), 'revenue': round(float(revenue[code]), 2)}
+            for code, name in sorted(enumerate(self.statuses), key=lambda pair: pair[1])
+            if counts[code]
+        ]
+
+    def daily_revenue(self, statuses=None, date_from=None, date_to=None):
+        """Order count and revenue per creation day, oldest day first.
+
+        Args:
+            statuses: Only orders with one of these statuses (default: all)
+            date_from, date_to: Inclusive range of days (``datetime.date``)
+        """
+        np = self.np
+        days = self['order_created_at'].astype('datetime64[D]')
+        mask = np.ones(len(days), dtype=bool)
+        status_mask = self._status_mask('order_status', statuses)
+        if status_mask is not None:
+            mask &= status_mask
+        if date_from is not None:
+            mask &= days >= np.datetime64(date_from, 'D')
+        if date_to is not None:
+            mask &= days <= np.datetime64(date_to, 'D')
+        unique_days, index = np.unique(days[mask], return_inverse=True)
+        counts = np.bincount(index, minlength=len(unique_days))
+        revenue = np.bincount(index, weights=self['order_total'][mask], minlength=len(unique_days))
+        return [
+            {'day': day.item().isoformat(), 'order_count': int(count), 'revenue': round(float(total), 2)}
+            for day, count, total in zip(unique_days, counts, revenue)
+        ]
+
+    def product_totals(self, statuses=None):
+        """Units and revenue per product id.
+
+        Returns:
+            Tuple of arrays (product_ids, units, revenue), aligned by position
+        """
+        np = self.np
+        products = self['item_product']
+        quantity = self['item_quantity']
+        subtotal = self['item_subtotal']
+        mask = self._status_mask('item_status', statuses)
+        if mask is not None:
+            products, quantity, subtotal = products[mask], quantity[mask], subtotal[mask]
+        product_ids = self['product_ids']
+        units = np.bincount(products, weights=quantity, minlength=len(product_ids)).astype('int64')
+        revenue = np.bincount(products, weights=subtotal, minlength=len(product_ids))
+        return product_ids, units, revenue
+
+    def top_products(self, limit=10):
+        """Products with the most units sold in orders that were not cancelled.
+
+        Same ranking as ``ReportService.get_top_products``: most units
+        first, then lowest product id.
+        """
+        np = self.np
+        sold = [s for s in self.statuses if s != Order.STATUS_CANCELLED]
+        product_ids, units, revenue = self.product_totals(sold)
+        # lexsort sorts by the last key first
+        order = np.lexsort((product_ids, -units))
+        return [
+            {'product_id': int(product_ids[i]), 'units_sold': int(units[i]),
+             'revenue': round(float(revenue[i]), 2)}
+            for i in order[:limit] if units[i] > 0
+        ]
@@ -0,0 +1,157 @@
+"""Several API calls in one HTTP request (``POST /api/batch``).
+
+Clients that make a fixed sequence of calls - create a product, adjust its
+stock, place an order, confirm it - send them as one list of operations
+and pay for a single network round trip. Each operation is dispatched to
+its view in-process, with the same validation and responses as a separate
+request. The rate limiter charges the batch one write per operation.
+
+An operation may use the response of an earlier one: ``$N.field`` (``N``
+is the position of the operation, fields may be nested, e.g.
+``$2.items.0.id``) is replaced in the path, and a body value that is
+exactly such a reference is replaced by the referenced value.
+
+By default every operation commits on its own, as a separate request
+would, and a failing operation does not stop the ones after it. In atomic
+mode the operations share one transaction: the first one that fails
+(status 400 or higher, including a 500 for an unexpected error) rolls
+back all of them and the rest are not run.
+Order shards are committed one database after another, so a batch that
+spans shards is atomic per database only.
+"""
+import re
+
+from flask import current_app, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+from app.models import db
+
+METHODS = frozenset(['GET', 'POST', 'PATCH', 'PUT', 'DELETE'])
+# Batches, streams and long polls cannot be operations
+EXCLUDED_ENDPOINTS = frozenset(['api.run_batch', 'api.stream_orders', 'api.get_events'])
+
+_REFERENCE = re.compile(r'\$(\d+)((?:\.\w+)+)')
+
+
+def run(operations, atomic=False):
+    """Run the operations in order.
+
+    Args:
+        operations: List of dicts with 'method', 'path' and optional 'body'
+        atomic: Run all operations in one transaction, all or nothing
+
+    Returns:
+        List of {'status', 'body'} dicts, one per operation that ran. In
+        atomic mode a failed operation is the last one and nothing was
+        committed.
+
+    Raises:
+        ValueError: If the operations are malformed; none of them is run
+    """
+    _validate(operations)
+    results = []
+    if not atomic:
+        for operation in operations:
+            results.append(_dispatch(operation, results))
+        return results
+
+    session = db.session
+    # Services only flush; the batch commits or rolls back for all of them
+    session.info['defer_commit'] = True
+    try:
+        for operation in operations:
+            result = _dispatch(operation, results)
+            results.append(result)
+            if result['status'] >= 400:
+                session.rollback()
+                return results
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        session.info.pop('defer_commit', None)
+    return results
+
+
+def _validate(operations):
+    max_operations = current_app.config['BATCH_MAX_OPERATIONS']
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("operations must be a non-empty list")
+    if len(operations) > max_operations:
+        raise ValueError(f"A batch can have at most {max_operations} operations")
+    for i, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f"Operation {i} must be an object")
+        method = operation.get('method')
+        if not isinstance(method, str) or method.upper() not in METHODS:
+            raise ValueError(f"Operation {i}: method must be one of {', '.join(sorted(METHODS))}")
+        path = operation.get('path')
+        if not isinstance(path, str) or not path.startswith('/api/'):
+            raise ValueError(f"Operation {i}: path must start with /api/")
+
+
+def _dispatch(operation, results):
+    """Run one operation through its view; return its status and JSON body."""
+    try:
+        path = _REFERENCE.sub(lambda m: str(_resolve(m, results)), operation['path'])
+        body = _substitute(operation.get('body'), results)
+    except ValueError as e:
+        return {'status': 400, 'body': {'error': str(e)}}
+
+    builder = EnvironBuilder(
+        path=path, method=operation['method'].upper(), json=body,
+        environ_base={'REMOTE_ADDR': request.remote_addr}
+    )
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    # Shares the application context, and so the database session, of the batch
+    with current_app.request_context(environ):
+        try:
+            if request.endpoint in EXCLUDED_ENDPOINTS:
+                return {'status': 400, 'body': {'error': f"{path} cannot be part of a batch"}}
+            rv = current_app.dispatch_request()
+        except HTTPException as e:
+            return {'status': e.code, 'body': {'error': e.description}}
+        except Exception as e:
+            try:
+                # Error handlers of the blueprint, e.g. 409 on ConcurrencyConflict
+                rv = current_app.handle_user_exception(e)
+            except Exception:
+                # No handler: fail this operation only, as a separate request
+                # would get its own 500, and drop its half-done changes
+                current_app.logger.exception('Batch operation %s %s failed', request.method, path)
+                db.session.rollback()
+                return {'status': 500, 'body': {'error': 'Internal server error'}}
+        response = current_app.make_response(rv)
+        return {'status': response.status_code, 'body': response.get_json(silent=True)}
+
+
+def _resolve(match, results):
+    """Value of a ``$N.field`` reference to the response of an earlier operation."""
+    reference, index = match.group(0), int(match.group(1))
+    if index >= len(results) or results[index]['status'] >= 400:
+        raise ValueError(f"{reference}: operation {index} has no successful result")
+    value = results[index]['body']
+    for key in match.group(2)[1:].split('.'):
+        try:
+            value = value[int(key)] if isinstance(value, list) else value[key]
+        except (LookupError, TypeError, ValueError):
+            raise ValueError(f"{reference}: no such field in the result of operation {index}")
+    return value
+
+
+def _substitute(value, results):
+    """Replace references in a request body, keeping the referenced types."""
+    if isinstance(value, str):
+        match = _REFERENCE.fullmatch(value)
+        return _resolve(match, results) if match else value
+    if isinstance(value, list):
+        return [_substitute(v, results) for v in value]
+    if isinstance(value, dict):
+        return {k: _substitute(v, results) for k, v in value.items()}
+    return value
@@ -0,0 +1,143 @@
+"""In-process fan-out of order status changes to Server-Sent Events clients.
+
+A single broadcaster thread per application reads new order events from the
+outbox - one query per wake-up, however many clients are connected - and
+pushes them into a bounded queue per subscriber. A subscriber whose queue
+is full is a slow consumer: it is dropped rather than allowed to hold
+events in memory, and its client reconnects with ``Last-Event-ID`` to
+replay what it missed from the outbox.
+"""
+import queue
+import threading
+
+from app.models import db
+from app.services import EventService
+
+ORDER_EVENT_PREFIX = 'order.'
+
+
+class Subscriber:
+    """One connected stream client.
+
+    Args:
+        statuses: Order statuses the client is interested in, or None for all
+        after: Sequence number of the last event the client has seen
+        buffer_size: Maximum number of events waiting to be sent
+    """
+
+    def __init__(self, statuses, after, buffer_size):
+        self.statuses = statuses
+        self.cursor = after
+        self.events = queue.Queue(maxsize=buffer_size)
+        self.overflowed = False
+
+    def wants(self, event):
+        """Whether the event concerns an order entering or leaving a watched status."""
+        if not event.event_type.startswith(ORDER_EVENT_PREFIX):
+            return False
+        if self.statuses is None:
+            return True
+        payload = event.payload
+        return payload['status'] in self.statuses or payload.get('previous_status') in self.statuses
+
+
+class OrderBroadcaster:
+    """Reads order events once and fans them out to all subscribers."""
+
+    def __init__(self, app, batch_size=500):
+        self.app = app
+        self.batch_size = batch_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        app.extensions['order_broadcaster'] = self
+
+    def subscribe(self, statuses=None, after=None):
+        """Register a subscriber, starting the broadcaster thread if needed.
+
+        Args:
+            statuses: Iterable of statuses to filter on, or None for all
+            after: Replay events after this sequence number; defaults to
+                the newest event, i.e. only future changes are delivered
+        """
+        if after is None:
+            after = EventService.get_latest_seq() or 0
+        subscriber = Subscriber(
+            frozenset(statuses) if statuses else None,
+            after,
+            self.app.config['SSE_BUFFER_SIZE']
+        )
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='order-broadcaster', daemon=True
+                )
+                self._thread.start()
+        # Deliver anything committed before the thread picked up the subscriber
+        self.app.extensions['event_notifier'].notify()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _run(self):
+        notifier = self.app.extensions['event_notifier']
+        poll_interval = self.app.config['OUTBOX_POLL_INTERVAL']
+        with self.app.app_context():
+            try:
+                while True:
+                    version = notifier.version
+                    with self._lock:
+                        subscribers = list(self._subscribers)
+                        if not subscribers:
+                            # Exit while holding the lock so subscribe() starts a new thread
+                            self._thread = None
+                            return
+                    try:
+                        self._dispatch(subscribers)
+                    finally:
+                        db.session.close()
+                    notifier.wait(version, poll_interval)
+            except Exception:
+                self.app.logger.exception('Order broadcaster stopped')
+                # End every stream; clients reconnect and replay from the outbox
+                with self._lock:
+                    for subscriber in self._subscribers:
+                        subscriber.overflowed = True
+                    self._subscribers.clear()
+                    self._thread = None
+
+    def _dispatch(self, subscribers):
+        """Fetch events after the oldest subscriber cursor and fan them out."""
+        while True:
+            active = [s for s in subscribers if not s.overflowed]
+            if not active:
+                return
+            start = min(s.cursor for s in active)
+            events = EventService.get_events(start, self.batch_size)
+            if not events:
+                return
+            for subscriber in active:
+                self._deliver(subscriber, events)
+            if len(events) < self.batch_size:
+                return
+
+    def _deliver(self, subscriber, events):
+        for event in events:
+            if event.seq <= subscriber.cursor:
+                continue
+            if subscriber.wants(event):
+                try:
+                    subscriber.events.put_nowait(event.to_dict())
+                except queue.Full:
+                    subscriber.overflowed = True
+                    self.unsubscribe(subscriber)
+                    return
+            subscriber.cursor = event.seq
+
+
+def init_app(app):
+    """Attach an ``OrderBroadcaster`` to the application."""
+    OrderBroadcaster(app)
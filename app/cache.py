@@ -0,0 +1,169 @@
+"""Cache of serialized ``GET /api/orders/<id>`` responses.
+
+Completed and cancelled orders never change again, so their JSON is kept
+for good: in a bounded in-memory LRU (``ORDER_CACHE_MAX_ENTRIES``) and,
+with ``ORDER_CACHE_PATH`` set, in an on-disk ``dbm`` file that entries
+evicted from memory spill into. Their responses carry a long-lived,
+immutable, private ``Cache-Control`` header.
+
+``dbm`` files have no locking between processes: each worker process needs
+its own ``ORDER_CACHE_PATH``, or none.
+
+Pending and confirmed orders are cached for ``ORDER_CACHE_TTL_SECONDS``
+only. ``OrderService`` marks the orders it changes with
+``invalidate_orders``; they are dropped from the cache once the
+transaction commits, so this process never serves a state older than the
+last commit. Changes made by other processes show up after the TTL.
+
+Order items keep the product name they were ordered with, so product
+changes never make a cached order stale.
+"""
+import dbm
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, jsonify
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import db, Order
+
+TERMINAL_STATUSES = frozenset([Order.STATUS_COMPLETED, Order.STATUS_CANCELLED])
+
+# Orders carry customer data: browsers may keep them, shared caches must not
+TERMINAL_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+LIVE_CACHE_CONTROL = 'no-cache'
+
+
+class OrderResponseCache:
+    """Serialized order responses, by order id."""
+
+    def __init__(self, app):
+        config = app.config
+        self.max_entries = config['ORDER_CACHE_MAX_ENTRIES']
+        self.ttl = config['ORDER_CACHE_TTL_SECONDS']
+        self.path = config['ORDER_CACHE_PATH']
+        self.stats = {'hits': 0, 'misses': 0, 'spilled': 0}
+        # Bumped by every invalidation; a response loaded before a bump is not stored
+        self.generation = 0
+        self._terminal = OrderedDict()
+        self._live = {}
+        self._lock = threading.Lock()
+        self._disk = dbm.open(self.path, 'c') if self.path else None
+        app.extensions['order_response_cache'] = self
+
+    def get(self, order_id):
+        """The cached response for an order, or None."""
+        body = self._get_body(order_id)
+        with self._lock:
+            self.stats['hits' if body else 'misses'] += 1
+        if body is None:
+            return None
+        terminal, data = body
+        response = current_app.response_class(data, mimetype='application/json')
+        response.headers['Cache-Control'] = TERMINAL_CACHE_CONTROL if terminal else LIVE_CACHE_CONTROL
+        return response
+
+    def put(self, order, generation):
+        """Serialize ``order`` into a response and cache it.
+
+        Args:
+            generation: Value of ``self.generation`` read before the order
+                was loaded; if an invalidation happened since, the order may
+                be stale and is not stored
+        """
+        response = jsonify(order.to_dict())
+        terminal = order.status in TERMINAL_STATUSES
+        response.headers['Cache-Control'] = TERMINAL_CACHE_CONTROL if terminal else LIVE_CACHE_CONTROL
+        data = response.get_data()
+        with self._lock:
+            if generation != self.generation:
+                return response
+            if terminal:
+                self._store_terminal(order.id, data)
+            else:
+                self._live[order.id] = (time.monotonic() + self.ttl, data)
+                if len(self._live) > self.max_entries:
+                    self._drop_expired_live()
+        return response
+
+    def invalidate(self, order_ids):
+        """Drop the cached responses of orders that changed."""
+        with self._lock:
+            self.generation += 1
+            for order_id in order_ids:
+                self._live.pop(order_id, None)
+
+    def close(self):
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+
+    def _get_body(self, order_id):
+        """(terminal, JSON bytes) of a cached order, or None."""
+        with self._lock:
+            data = self._terminal.get(order_id)
+            if data is not None:
+                self._terminal.move_to_end(order_id)
+                return True, data
+            live = self._live.get(order_id)
+            if live is not None:
+                if live[0] > time.monotonic():
+                    return False, live[1]
+                del self._live[order_id]
+            if self._disk is not None:
+                data = self._disk.get(str(order_id))
+                if data is not None:
+                    self._store_terminal(order_id, data)
+                    return True, data
+        return None
+
+    def _store_terminal(self, order_id, data):
+        self._terminal[order_id] = data
+        self._terminal.move_to_end(order_id)
+        while len(self._terminal) > self.max_entries:
+            evicted_id, evicted = self._terminal.popitem(last=False)
+            if self._disk is not None:
+                self._disk[str(evicted_id)] = evicted
+                self.stats['spilled'] += 1
+
+    def _drop_expired_live(self):
+        now = time.monotonic()
+        for order_id, (expires, _) in list(self._live.items()):
+            if expires <= now:
+                del self._live[order_id]
+        # Still full of fresh entries: drop the oldest half
+        if len(self._live) > self.max_entries:
+            for order_id in list(self._live)[:len(self._live) // 2]:
+                del self._live[order_id]
+
+
+def init_app(app):
+    """Enable the response cache when ``ORDER_CACHE_ENABLED`` is set."""
+    if app.config['ORDER_CACHE_ENABLED']:
+        OrderResponseCache(app)
+
+
+def invalidate_orders(order_ids):
+    """Drop the orders' cached responses once the current transaction commits."""
+    cache = current_app.extensions.get('order_response_cache')
+    if cache is not None:
+        info = db.session.info
+        info['order_response_cache'] = cache
+        info.setdefault('invalidated_orders', set()).update(order_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    cache = session.info.pop('order_response_cache', None)
+    order_ids = session.info.pop('invalidated_orders', None)
+    if cache is not None and order_ids:
+        cache.invalidate(order_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('order_response_cache', None)
+    session.info.pop('invalidated_orders', None)
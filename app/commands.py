@@ -0,0 +1,104 @@
+"""Maintenance commands available through the ``flask`` CLI."""
+import json
+import os
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+
+from app.models import Order
+from app.services import EventService, OrderService, ReportService
+
+
+def register_commands(app):
+    """Register the maintenance commands on the application."""
+    app.cli.add_command(prune_events)
+    app.cli.add_command(rebuild_rollups)
+    app.cli.add_command(expire_orders)
+    app.cli.add_command(export_orders)
+    app.cli.add_command(snapshot_orders)
+    app.cli.add_command(backfill_item_names)
+
+
+@click.command('prune-events')
+@click.option('--hours', type=float, default=None,
+              help='Keep events newer than this many hours (default: OUTBOX_RETENTION_HOURS).')
+def prune_events(hours):
+    """Delete outbox events older than the retention period."""
+    if hours is None:
+        hours = current_app.config['OUTBOX_RETENTION_HOURS']
+    deleted = EventService.prune_events(datetime.utcnow() - timedelta(hours=hours))
+    click.echo(f'Deleted {deleted} events')
+
+
+@click.command('rebuild-rollups')
+def rebuild_rollups():
+    """Regenerate the sales rollup tables from the orders."""
+    ReportService.rebuild_rollups()
+    click.echo('Rollups rebuilt')
+
+
+@click.command('expire-orders')
+@click.option('--minutes', type=float, default=None,
+              help='Expire orders pending for longer than this (default: ORDER_RESERVATION_TTL_MINUTES).')
+def expire_orders(minutes):
+    """Cancel stale pending orders and return their reserved stock."""
+    if minutes is None:
+        minutes = current_app.config['ORDER_RESERVATION_TTL_MINUTES']
+    if minutes is None:
+        raise click.UsageError('Pass --minutes or set ORDER_RESERVATION_TTL_MINUTES')
+    result = OrderService.expire_stale_orders(
+        datetime.utcnow() - timedelta(minutes=minutes),
+        current_app.config['ORDER_EXPIRY_BATCH_SIZE']
+    )
+    click.echo(
+        f"Expired {result['expired']} orders, released {sum(result['released'].values())} "
+        f"units of {len(result['released'])} products"
+    )
+
+
+@click.command('export-orders')
+@click.option('--status', type=click.Choice(Order.VALID_STATUSES), default=None,
+              help='Export only orders with this status.')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-',
+              help='File to write to (default: standard output).')
+def export_orders(status, output):
+    """Write orders with their items as newline-delimited JSON.
+    
+    Orders are streamed in batches, so memory use does not grow with the
+    number of orders.
+    """
+    if status:
+        orders = OrderService.iter_orders_by_status(status)
+    else:
+        orders = OrderService.iter_all_orders()
+    count = 0
+    for order in orders:
+        output.write(json.dumps(order.to_dict(), ensure_ascii=False) + '\n')
+        count += 1
+    click.echo(f'Exported {count} orders', err=True)
+
+
+@click.command('snapshot-orders')
+@click.option('--output', type=click.Path(file_okay=False), default=None,
+              help='Snapshot directory (default: order-snapshot in the instance folder).')
+def snapshot_orders(output):
+    """Write a columnar snapshot of orders and items for analytics (needs NumPy)."""
+    from app import analytics
+    
+    if output is None:
+        output = os.path.join(current_app.instance_path, 'order-snapshot')
+    try:
+        counts = analytics.write_snapshot(output)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Wrote {counts['orders']} orders and {counts['items']} items to {output}")
+
+
+@click.command('backfill-item-names')
+@click.option('--batch-size', type=click.IntRange(min=1), default=500,
+              help='Items updated per transaction.')
+def backfill_item_names(batch_size):
+    """Store the product name on order items created before it was recorded."""
+    updated = OrderService.backfill_item_names(batch_size)
+    click.echo(f'Backfilled {updated} order items')
@@ -6,6 +6,75 @@ class Config:
     """Base configuration."""
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # Group commit: batch writes from concurrent requests into one commit
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', '').lower() in ('1', 'true', 'yes')
+    GROUP_COMMIT_WINDOW_MS = float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 2))
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+    
+    # Transactional outbox (GET /api/events)
+    OUTBOX_RETENTION_HOURS = float(os.environ.get('OUTBOX_RETENTION_HOURS', 168))
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 1.0))
+    OUTBOX_MAX_WAIT = float(os.environ.get('OUTBOX_MAX_WAIT', 30.0))
+    
+    # Server-Sent Events stream of order status changes
+    SSE_BUFFER_SIZE = int(os.environ.get('SSE_BUFFER_SIZE', 256))
+    SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15.0))
+    
+    # Reorder threshold for products without their own (unset: only per-product thresholds)
+    LOW_STOCK_DEFAULT_THRESHOLD = (
+        int(os.environ['LOW_STOCK_DEFAULT_THRESHOLD'])
+        if os.environ.get('LOW_STOCK_DEFAULT_THRESHOLD') else None
+    )
+    
+    # Cache of serialized GET /api/orders/<id> responses: completed and
+    # cancelled orders are kept (LRU, spilling into a dbm file at
+    # ORDER_CACHE_PATH if set; one process per file), others for ORDER_CACHE_TTL_SECONDS
+    ORDER_CACHE_ENABLED = os.environ.get('ORDER_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    ORDER_CACHE_MAX_ENTRIES = int(os.environ.get('ORDER_CACHE_MAX_ENTRIES', 10_000))
+    ORDER_CACHE_TTL_SECONDS = float(os.environ.get('ORDER_CACHE_TTL_SECONDS', 5))
+    ORDER_CACHE_PATH = os.environ.get('ORDER_CACHE_PATH')
+    
+    # Maximum number of operations in one POST /api/batch
+    BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS', 50))
+    
+    # Re-runs of a write whose order or product rows changed concurrently
+    # (optimistic locking) before it fails with 409
+    OPTIMISTIC_LOCK_RETRIES = int(os.environ.get('OPTIMISTIC_LOCK_RETRIES', 3))
+    
+    # Pending orders release their reserved stock after this many minutes
+    # (unset: reservations never expire)
+    ORDER_RESERVATION_TTL_MINUTES = (
+        float(os.environ['ORDER_RESERVATION_TTL_MINUTES'])
+        if os.environ.get('ORDER_RESERVATION_TTL_MINUTES') else None
+    )
+    ORDER_EXPIRY_INTERVAL = float(os.environ.get('ORDER_EXPIRY_INTERVAL', 60))
+    ORDER_EXPIRY_BATCH_SIZE = int(os.environ.get('ORDER_EXPIRY_BATCH_SIZE', 500))
+    
+    # Admission control: per-client token buckets and concurrency limits
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '').lower() in ('1', 'true', 'yes')
+    RATELIMIT_READ_RATE = float(os.environ.get('RATELIMIT_READ_RATE', 50))
+    RATELIMIT_READ_BURST = float(os.environ.get('RATELIMIT_READ_BURST', 100))
+    RATELIMIT_WRITE_RATE = float(os.environ.get('RATELIMIT_WRITE_RATE', 10))
+    RATELIMIT_WRITE_BURST = float(os.environ.get('RATELIMIT_WRITE_BURST', 20))
+    RATELIMIT_MAX_CONCURRENT_READS = int(os.environ.get('RATELIMIT_MAX_CONCURRENT_READS', 64))
+    RATELIMIT_MAX_CONCURRENT_WRITES = int(os.environ.get('RATELIMIT_MAX_CONCURRENT_WRITES', 16))
+    # Client id header, trusted only from these proxy addresses (comma-separated)
+    RATELIMIT_CLIENT_HEADER = os.environ.get('RATELIMIT_CLIENT_HEADER', 'X-Client-Id')
+    RATELIMIT_TRUSTED_PROXIES = [
+        address for address in os.environ.get('RATELIMIT_TRUSTED_PROXIES', '').split(',') if address
+    ]
+    # SQLite file shared by all worker processes (unset: per-process memory)
+    RATELIMIT_STORAGE_PATH = os.environ.get('RATELIMIT_STORAGE_PATH')
+    
+    # Order sharding: orders and their items are spread over these binds by
+    # customer email (unset: everything in SQLALCHEMY_DATABASE_URI).
+    # ORDER_SHARD_URLS is a comma-separated list of database URLs.
+    SQLALCHEMY_BINDS = {
+        f'order_shard_{i}': url
+        for i, url in enumerate(u for u in os.environ.get('ORDER_SHARD_URLS', '').split(',') if u)
+    }
+    ORDER_SHARD_BINDS = list(SQLALCHEMY_BINDS)
 
 
 class DevelopmentConfig(Config):
@@ -20,6 +89,13 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    GROUP_COMMIT_ENABLED = False
+    LOW_STOCK_DEFAULT_THRESHOLD = None
+    ORDER_RESERVATION_TTL_MINUTES = None
+    ORDER_CACHE_ENABLED = False
+    RATELIMIT_ENABLED = False
+    SQLALCHEMY_BINDS = {}
+    ORDER_SHARD_BINDS = []
 
 
 class ProductionConfig(Config):
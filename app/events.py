@@ -0,0 +1,82 @@
+"""Change notifications for the transactional outbox.
+
+Services write ``OutboxEvent`` rows in the same transaction as the change
+they describe. Once such a transaction commits, the in-process
+``EventNotifier`` wakes up everyone waiting for new events, so long-poll
+consumers of ``GET /api/events`` re-read the outbox only when something was
+actually written. The notification carries no data - waiters always read
+the committed rows - so a wake-up from a rolled-back savepoint is harmless.
+
+Writes made by other processes do not trigger the notifier; waiters
+re-check the outbox every ``OUTBOX_POLL_INTERVAL`` seconds to catch those.
+"""
+import threading
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import db, OutboxEvent
+
+
+class EventNotifier:
+    """Wakes up threads waiting for new outbox events."""
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.version = 0
+    
+    def notify(self):
+        """Signal that new events were committed."""
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+    
+    def wait(self, version, timeout):
+        """Wait until the version moves past ``version`` or ``timeout`` expires.
+        
+        Returns:
+            True if new events were signalled
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version != version, timeout)
+
+
+def init_app(app):
+    """Attach an ``EventNotifier`` to the application."""
+    app.extensions['event_notifier'] = EventNotifier()
+
+
+def record_event(event_type, aggregate_type, aggregate_id, payload):
+    """Add an outbox event to the current unit of work."""
+    db.session.add(OutboxEvent(
+        event_type=event_type,
+        aggregate_type=aggregate_type,
+        aggregate_id=aggregate_id,
+        payload=payload
+    ))
+    _mark_session(db.session)
+
+
+def record_events(rows):
+    """Add many outbox events (dicts of OutboxEvent columns) in one INSERT."""
+    if rows:
+        # Core insert: ORM bulk inserts are not available on a sharded session
+        db.session.execute(OutboxEvent.__table__.insert(), rows)
+        _mark_session(db.session)
+
+
+def _mark_session(session):
+    session.info['event_notifier'] = current_app.extensions['event_notifier']
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_after_commit(session):
+    notifier = session.info.pop('event_notifier', None)
+    if notifier is not None:
+        notifier.notify()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('event_notifier', None)
@@ -0,0 +1,105 @@
+"""Expiry of stale stock reservations.
+
+Placing an order reserves its stock straight away. With
+``ORDER_RESERVATION_TTL_MINUTES`` set, a sweeper thread wakes up every
+``ORDER_EXPIRY_INTERVAL`` seconds and cancels the orders that are still
+pending after that time, in batches of ``ORDER_EXPIRY_BATCH_SIZE`` (see
+``OrderService.expire_stale_orders``), so abandoned orders do not hold stock
+forever. Expired orders produce the usual ``order.cancelled`` events.
+
+The sweeper keeps counters of what it released, served by
+``GET /api/orders/expiry``. Every worker process runs its own sweeper;
+the guarded status UPDATE makes concurrent sweeps safe, each order is
+expired once.
+"""
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from app.models import db
+from app.services import OrderService
+
+
+class ReservationSweeper:
+    """Periodically expires pending orders older than the reservation TTL."""
+
+    def __init__(self, app):
+        config = app.config
+        self.app = app
+        self.ttl = timedelta(minutes=config['ORDER_RESERVATION_TTL_MINUTES'])
+        self.interval = config['ORDER_EXPIRY_INTERVAL']
+        self.batch_size = config['ORDER_EXPIRY_BATCH_SIZE']
+        self.stats = {
+            'sweeps': 0, 'failed_sweeps': 0, 'orders_expired': 0,
+            'units_released': 0, 'last_sweep_at': None,
+        }
+        self.released = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        app.extensions['reservation_sweeper'] = self
+
+    def start(self):
+        """Start the sweeper thread."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='reservation-sweeper', daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the sweeper thread, letting a running sweep finish."""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def sweep(self):
+        """Expire the stale orders now; must run in an application context.
+
+        Returns:
+            The result of ``OrderService.expire_stale_orders``
+        """
+        result = OrderService.expire_stale_orders(
+            datetime.utcnow() - self.ttl, self.batch_size
+        )
+        with self._lock:
+            self.stats['sweeps'] += 1
+            self.stats['orders_expired'] += result['expired']
+            self.stats['units_released'] += sum(result['released'].values())
+            self.stats['last_sweep_at'] = datetime.utcnow()
+            self.released.update(result['released'])
+        return result
+
+    def metrics(self):
+        """Counters since start, with units released per product (most first)."""
+        with self._lock:
+            stats = dict(self.stats)
+            released = self.released.most_common()
+        if stats['last_sweep_at'] is not None:
+            stats['last_sweep_at'] = stats['last_sweep_at'].isoformat()
+        stats['released_by_product'] = [
+            {'product_id': product_id, 'units': units} for product_id, units in released
+        ]
+        return stats
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._stopped.wait(self.interval):
+                try:
+                    self.sweep()
+                except Exception:
+                    db.session.rollback()
+                    with self._lock:
+                        self.stats['failed_sweeps'] += 1
+                    self.app.logger.exception('Reservation sweep failed')
+                finally:
+                    db.session.remove()
+
+
+def init_app(app):
+    """Start the sweeper when ``ORDER_RESERVATION_TTL_MINUTES`` is set."""
+    if app.config['ORDER_RESERVATION_TTL_MINUTES'] is not None and app.config['ORDER_EXPIRY_INTERVAL'] > 0:
+        ReservationSweeper(app).start()
@@ -0,0 +1,158 @@
+"""Group commit for concurrent write requests.
+
+Every write endpoint normally ends in its own ``db.session.commit()``, so on
+SQLite each request pays for a separate fsync. With group commit enabled,
+write requests hand their service call to a single committer thread. The
+committer collects the calls that arrive within a short window, runs each
+one inside its own SAVEPOINT and commits them together, so one fsync covers
+the whole batch. A failing call only rolls back its own savepoint; the
+caller still receives its own result or exception.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app.models import db
+
+
+class _Job:
+    """A unit of work waiting for the committer."""
+
+    __slots__ = ('fn', 'future')
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.future = Future()
+
+
+class GroupCommitter:
+    """Collects writes from concurrent requests and commits them in batches.
+
+    Args:
+        app: Flask application whose database the committer writes to
+        window_ms: How long to wait for more writes after the first one arrives
+        max_batch: Maximum number of writes committed together
+    """
+
+    def __init__(self, app, window_ms=2.0, max_batch=64):
+        self.app = app
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.stats = {'batches': 0, 'jobs': 0, 'failed_commits': 0}
+        self._queue = queue.Queue()
+        self._thread = None
+        app.extensions['group_commit'] = self
+
+    def start(self):
+        """Start the committer thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='group-commit', daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Finish the queued writes and stop the committer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, fn):
+        """Run ``fn`` in the next batch and wait until that batch is committed.
+
+        ``fn`` is called without arguments in the committer's application
+        context, so it sees the committer's ``db.session``. Whatever it
+        returns must not need the session afterwards (serialize ORM objects
+        inside ``fn``).
+
+        Returns:
+            The value returned by ``fn``
+
+        Raises:
+            Whatever ``fn`` raised, or the error of a failed commit
+        """
+        job = _Job(fn)
+        self._queue.put(job)
+        return job.future.result()
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    return
+                batch = [job]
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        job = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(job)
+                self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        """Run a batch of jobs in one transaction, one savepoint per job."""
+        session = db.session
+        session.info['defer_commit'] = True
+        done = []
+        try:
+            _begin(session)
+            for job in batch:
+                try:
+                    with session.begin_nested():
+                        result = job.fn()
+                except Exception as e:
+                    job.future.set_exception(e)
+                else:
+                    done.append((job, result))
+            session.commit()
+        except Exception:
+            session.rollback()
+            self.stats['failed_commits'] += 1
+            # The shared commit failed; retry each job on its own so one bad
+            # write cannot fail its neighbours.
+            session.info.pop('defer_commit', None)
+            for job, _ in done:
+                self._run_alone(job)
+        else:
+            for job, result in done:
+                job.future.set_result(result)
+        finally:
+            session.info.pop('defer_commit', None)
+            session.close()
+        self.stats['batches'] += 1
+        self.stats['jobs'] += len(batch)
+
+    def _run_alone(self, job):
+        session = db.session
+        try:
+            result = job.fn()
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            job.future.set_exception(e)
+        else:
+            job.future.set_result(result)
+
+
+def _begin(session):
+    """Open the outer transaction explicitly.
+
+    pysqlite only starts a transaction in front of DML, so without this the
+    first SAVEPOINT would itself become the transaction and releasing it
+    would commit every job separately. BEGIN IMMEDIATE also takes the write
+    lock up front instead of upgrading to it halfway through the batch.
+    """
+    connection = session.connection()
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
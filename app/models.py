@@ -2,18 +2,39 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from app.sharding import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Order ids encode their shard (see app.sharding) and outgrow 32 bits;
+# SQLite keeps INTEGER so the column stays a rowid alias
+BIG_ID = db.BigInteger().with_variant(db.Integer(), 'sqlite')
 
 
 class Product(db.Model):
     """Product model - represents items available for sale."""
     __tablename__ = 'products'
+    __table_args__ = (
+        # Only flagged products are indexed, so the watchlist stays small
+        db.Index(
+            'ix_products_low_stock_since', 'low_stock_since',
+            sqlite_where=db.text('low_stock_since IS NOT NULL'),
+            postgresql_where=db.text('low_stock_since IS NOT NULL')
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     price = db.Column(db.Float, nullable=False)
-    stock = db.Column(db.Integer, nullable=False, default=0)
+    stock = db.Column(db.Integer, nullable=False, default=0, index=True)
+    reorder_threshold = db.Column(db.Integer, nullable=True)
+    low_stock_since = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Optimistic locking: ORM updates check and bump it; the services' bulk
+    # UPDATEs bump it as well, so a stale object cannot overwrite them
+    version = db.Column(db.Integer, nullable=False, default=1)
+    
+    __mapper_args__ = {'version_id_col': version}
     
     def to_dict(self):
         return {
@@ -21,17 +42,35 @@ class Product(db.Model):
             'name': self.name,
             'price': self.price,
             'stock': self.stock,
+            'reorder_threshold': self.reorder_threshold,
+            'low_stock_since': self.low_stock_since.isoformat() if self.low_stock_since else None,
             'created_at': self.created_at.isoformat()
         }
     
     def is_available(self, quantity=1):
         """Check if product is available in requested quantity."""
         return self.stock >= quantity
+    
+    def is_low_stock(self, default_threshold=None):
+        """Check if stock is below the product's reorder threshold.
+        
+        Products without their own threshold use ``default_threshold``;
+        without either they are never low on stock.
+        """
+        threshold = self.reorder_threshold
+        if threshold is None:
+            threshold = default_threshold
+        return threshold is not None and self.stock < threshold
 
 
 class Order(db.Model):
     """Order model - represents customer orders."""
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Serves status filters and the search for expired reservations
+        # (pending orders placed before a cutoff), oldest first
+        db.Index('ix_orders_status_created_at', 'status', 'created_at'),
+    )
     
     STATUS_PENDING = 'pending'
     STATUS_CONFIRMED = 'confirmed'
@@ -40,12 +79,15 @@ class Order(db.Model):
     
     VALID_STATUSES = [STATUS_PENDING, STATUS_CONFIRMED, STATUS_CANCELLED, STATUS_COMPLETED]
     
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(BIG_ID, primary_key=True)
     customer_name = db.Column(db.String(100), nullable=False)
     customer_email = db.Column(db.String(120), nullable=False)
     status = db.Column(db.String(20), default=STATUS_PENDING)
     total_amount = db.Column(db.Float, default=0.0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    
+    __mapper_args__ = {'version_id_col': version}
     
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
     
@@ -78,21 +120,129 @@ class OrderItem(db.Model):
     """Order item model - represents products within an order."""
     __tablename__ = 'order_items'
     
-    id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    id = db.Column(BIG_ID, primary_key=True)
+    order_id = db.Column(BIG_ID, db.ForeignKey('orders.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    # Name at the time of the order: shown after renames, and lets orders be
+    # read without the products table (NULL only until the startup backfill)
+    product_name = db.Column(db.String(100), nullable=True)
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Float, nullable=False)
     subtotal = db.Column(db.Float, nullable=False)
     
     product = db.relationship('Product')
     
+    __table_args__ = (
+        # Only items still waiting for the name backfill are indexed, so the
+        # startup check for them is a lookup in an (eventually) empty index
+        db.Index(
+            'ix_order_items_unnamed', 'id',
+            sqlite_where=db.text('product_name IS NULL'),
+            postgresql_where=db.text('product_name IS NULL')
+        ),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
             'product_id': self.product_id,
-            'product_name': self.product.name if self.product else None,
+            'product_name': self.product_name,
             'quantity': self.quantity,
             'unit_price': self.unit_price,
             'subtotal': self.subtotal
         }
+
+
+class OutboxEvent(db.Model):
+    """Outbox event - a change recorded in the same transaction as the change itself.
+    
+    ``seq`` is an AUTOINCREMENT key, so sequence numbers are never reused,
+    even after old events are pruned. Consumers resume from the last
+    ``seq`` they processed.
+    """
+    __tablename__ = 'outbox_events'
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    ORDER_CREATED = 'order.created'
+    ORDER_CONFIRMED = 'order.confirmed'
+    ORDER_CANCELLED = 'order.cancelled'
+    ORDER_COMPLETED = 'order.completed'
+    PRODUCT_CREATED = 'product.created'
+    PRODUCT_UPDATED = 'product.updated'
+    PRODUCT_STOCK_CHANGED = 'product.stock_changed'
+    PRODUCT_LOW_STOCK = 'product.low_stock'
+    
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    event_type = db.Column(db.String(50), nullable=False)
+    aggregate_type = db.Column(db.String(20), nullable=False)
+    aggregate_id = db.Column(BIG_ID, nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'type': self.event_type,
+            'aggregate_type': self.aggregate_type,
+            'aggregate_id': self.aggregate_id,
+            'payload': self.payload,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+class DailyRevenue(db.Model):
+    """Rollup - number and value of orders per creation day and current status.
+    
+    Maintained incrementally by ``OrderService``; an order moves between
+    status rows as its status changes.
+    """
+    __tablename__ = 'daily_revenue'
+    
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'status': self.status,
+            'order_count': self.order_count,
+            'revenue': round(self.revenue, 2)
+        }
+
+
+class StatusRevenue(db.Model):
+    """Rollup - number and value of all orders per current status.
+    
+    Updated together with ``DailyRevenue``, so totals per status are read
+    from a handful of rows instead of summing every day.
+    """
+    __tablename__ = 'status_revenue'
+    
+    status = db.Column(db.String(20), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'order_count': self.order_count,
+            'revenue': round(self.revenue, 2)
+        }
+
+
+class ProductSales(db.Model):
+    """Rollup - units and revenue per product across orders that were not cancelled."""
+    __tablename__ = 'product_sales'
+    
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    units_sold = db.Column(db.Integer, nullable=False, default=0, index=True)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'units_sold': self.units_sold,
+            'revenue': round(self.revenue, 2)
+        }
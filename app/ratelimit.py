@@ -0,0 +1,226 @@
+"""Admission control and per-client rate limiting for the API.
+
+Every API request, except the health check, passes two checks before it
+reaches a view:
+
+1. A token bucket per client and budget (reads and writes are budgeted
+   separately). An empty bucket answers ``429`` with ``Retry-After``.
+2. A concurrency limit per budget. When all slots are taken the request is
+   rejected straight away with ``503`` instead of queueing behind the
+   others, which keeps latency bounded for the requests that are admitted.
+
+Buckets live in process memory, in an LRU capped at ``max_clients``
+entries; each bucket has its own lock. With ``RATELIMIT_STORAGE_PATH`` set, buckets are
+kept in a small SQLite file instead and shared by every worker process on
+the host; each check is then a single atomic UPSERT. The concurrency limit
+always applies per process.
+
+Clients are told apart by their address. The ``RATELIMIT_CLIENT_HEADER``
+header is only used for requests coming from ``RATELIMIT_TRUSTED_PROXIES``,
+which must set it themselves; anyone else could send a new value with
+every request and always get a full bucket.
+
+A batch (``POST /api/batch``) takes one write token per operation, so
+batching saves round trips but not budget. A batch with more operations
+than the write burst can never be admitted and is rejected outright.
+"""
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request
+
+READ = 'read'
+WRITE = 'write'
+READ_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+# Exempt from all limits
+EXEMPT_ENDPOINTS = frozenset(['api.health_check'])
+BATCH_ENDPOINT = 'api.run_batch'
+# Long-lived connections that would pin a concurrency slot while idle;
+# they are still rate limited
+UNSLOTTED_ENDPOINTS = frozenset(['api.get_events', 'api.stream_orders'])
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second."""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated', 'lock')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+        self.lock = threading.Lock()
+
+    def take(self, now, cost=1):
+        """Take ``cost`` tokens, or none if there are not enough.
+
+        Returns:
+            0 if allowed, otherwise seconds until enough tokens are available
+        """
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return 0
+            return (cost - self.tokens) / self.rate
+
+
+class MemoryBucketStore:
+    """Token buckets kept in this process, at most ``max_clients`` of them.
+
+    When full, the bucket of the least recently seen client is dropped;
+    that client starts again with a full bucket.
+    """
+
+    def __init__(self, max_clients=100_000):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, burst, now)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+        return bucket.take(now, cost)
+
+
+class SQLiteBucketStore:
+    """Token buckets shared between processes through a SQLite file."""
+
+    _TAKE = """
+        INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (:key, :burst - :cost, :now)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = MIN(:burst, tokens + (:now - updated) * :rate) - :cost,
+            updated = :now
+        WHERE MIN(:burst, tokens + (:now - updated) * :rate) >= :cost
+        RETURNING tokens
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # Limiter state is disposable: skip fsync, let readers run during writes
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, rate, burst, cost=1):
+        now = time.time()
+        params = {'key': key, 'rate': rate, 'burst': burst, 'cost': cost, 'now': now}
+        connection = self._connection()
+        if connection.execute(self._TAKE, params).fetchone() is not None:
+            return 0
+        row = connection.execute(
+            'SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?', (key,)
+        ).fetchone()
+        tokens = min(burst, row[0] + (now - row[1]) * rate) if row else 0
+        return max(cost - tokens, 0) / rate
+
+
+class RateLimiter:
+    """Applies the rate and concurrency limits to API requests."""
+
+    def __init__(self, app):
+        config = app.config
+        self.budgets = {
+            READ: (config['RATELIMIT_READ_RATE'], config['RATELIMIT_READ_BURST']),
+            WRITE: (config['RATELIMIT_WRITE_RATE'], config['RATELIMIT_WRITE_BURST']),
+        }
+        self.slots = {
+            READ: threading.BoundedSemaphore(config['RATELIMIT_MAX_CONCURRENT_READS']),
+            WRITE: threading.BoundedSemaphore(config['RATELIMIT_MAX_CONCURRENT_WRITES']),
+        }
+        self.client_header = config['RATELIMIT_CLIENT_HEADER']
+        self.trusted_proxies = frozenset(config['RATELIMIT_TRUSTED_PROXIES'])
+        if config['RATELIMIT_STORAGE_PATH']:
+            self.store = SQLiteBucketStore(config['RATELIMIT_STORAGE_PATH'])
+        else:
+            self.store = MemoryBucketStore()
+        app.extensions['rate_limiter'] = self
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+
+    def client_key(self):
+        """The client a request is charged to.
+
+        Its address, or the client header if the request comes through a
+        trusted proxy.
+        """
+        address = request.remote_addr or 'unknown'
+        if address in self.trusted_proxies:
+            return request.headers.get(self.client_header) or address
+        return address
+
+    def _admit(self):
+        if request.blueprint != 'api' or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+        budget = READ if request.method in READ_METHODS else WRITE
+
+        rate, burst = self.budgets[budget]
+        cost = _batch_cost() if request.endpoint == BATCH_ENDPOINT else 1
+        if cost > burst:
+            return _reject(429, f'A batch can have at most {burst:g} operations', None)
+        wait = self.store.take(f'{budget}:{self.client_key()}', rate, burst, cost)
+        if wait:
+            return _reject(429, 'Rate limit exceeded', wait)
+
+        if request.endpoint in UNSLOTTED_ENDPOINTS:
+            return None
+        slots = self.slots[budget]
+        if not slots.acquire(blocking=False):
+            return _reject(503, 'Server busy, try again later', 1)
+        # Kept per request rather than in g: the operations of a batch run in
+        # request contexts of their own that share the batch's g
+        request.environ['ratelimit.slot'] = slots
+        return None
+
+    def _release(self, exc):
+        slots = request.environ.pop('ratelimit.slot', None)
+        if slots is not None:
+            slots.release()
+
+
+def _batch_cost():
+    """Write tokens a batch takes: one per operation."""
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    # A malformed batch is rejected by the view without running anything
+    return max(len(operations), 1) if isinstance(operations, list) else 1
+
+
+def _reject(status, message, retry_after):
+    response = jsonify({'error': message})
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_app(app):
+    """Enable rate limiting when ``RATELIMIT_ENABLED`` is set."""
+    if app.config['RATELIMIT_ENABLED']:
+        RateLimiter(app)
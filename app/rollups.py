@@ -0,0 +1,181 @@
+"""Incrementally maintained sales rollups.
+
+``OrderService`` calls these helpers inside its own transactions, so the
+``daily_revenue``, ``status_revenue`` and ``product_sales`` tables always
+agree with the orders they summarise. Each helper takes already aggregated deltas and applies
+them with one INSERT ... ON CONFLICT DO UPDATE (executemany) per table.
+``rebuild()`` recomputes the tables from scratch with INSERT ... SELECT, or
+sums per-shard aggregates when orders are sharded. ``init_app`` runs it at
+startup when a database has orders but no rollups yet, e.g. right after an
+upgrade created the tables; deltas applied to empty tables would go negative.
+"""
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import Date, cast, delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import sharding
+from app.models import db, DailyRevenue, Order, OrderItem, ProductSales, StatusRevenue
+
+_UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def day_of(column):
+    """SQL expression for the calendar day of a datetime column."""
+    if db.session.get_bind(mapper=Order).dialect.name == 'sqlite':
+        # CAST(... AS DATE) has numeric affinity on SQLite
+        return func.date(column)
+    return cast(column, Date)
+
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _increment(model, keys, rows):
+    """Add the delta columns of ``rows`` to the rollup, inserting missing rows."""
+    if not rows:
+        return
+    table = model.__table__
+    deltas = [column for column in rows[0] if column not in keys]
+    dialect = db.session.get_bind(mapper=model).dialect.name
+    
+    if dialect in _UPSERT_DIALECTS:
+        stmt = _UPSERT_DIALECTS[dialect](table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={column: table.c[column] + stmt.excluded[column] for column in deltas}
+        )
+        db.session.execute(stmt, rows)
+        return
+    
+    for row in rows:
+        result = db.session.execute(
+            update(table)
+            .where(*(table.c[key] == row[key] for key in keys))
+            .values({column: table.c[column] + row[column] for column in deltas})
+        )
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(row))
+
+
+def record_orders(moves):
+    """Apply order count/revenue changes to ``daily_revenue`` and ``status_revenue``.
+    
+    Args:
+        moves: Iterable of (day, previous_status, new_status, count, revenue);
+            previous_status is None for new orders
+    """
+    totals = defaultdict(lambda: [0, 0.0])
+    for day, previous_status, new_status, count, revenue in moves:
+        day = _as_date(day)
+        if previous_status is not None:
+            totals[(day, previous_status)][0] -= count
+            totals[(day, previous_status)][1] -= revenue
+        totals[(day, new_status)][0] += count
+        totals[(day, new_status)][1] += revenue
+    by_status = defaultdict(lambda: [0, 0.0])
+    for (_, status), (count, revenue) in totals.items():
+        by_status[status][0] += count
+        by_status[status][1] += revenue
+    _increment(DailyRevenue, ('day', 'status'), [
+        {'day': day, 'status': status, 'order_count': count, 'revenue': revenue}
+        for (day, status), (count, revenue) in sorted(totals.items())
+    ])
+    _increment(StatusRevenue, ('status',), [
+        {'status': status, 'order_count': count, 'revenue': revenue}
+        for status, (count, revenue) in sorted(by_status.items())
+    ])
+
+
+def record_order_status(order, previous_status):
+    """Move a single order between status rows of ``daily_revenue``."""
+    record_orders([(order.created_at.date(), previous_status, order.status, 1, order.total_amount)])
+
+
+def record_product_sales(sales, sign=1):
+    """Add (sign=1) or remove (sign=-1) sold units and revenue per product.
+    
+    Args:
+        sales: Mapping of product_id to (units, revenue)
+    """
+    _increment(ProductSales, ('product_id',), [
+        {'product_id': product_id, 'units_sold': sign * units, 'revenue': sign * revenue}
+        for product_id, (units, revenue) in sorted(sales.items())
+    ])
+
+
+def init_app(app):
+    """Fill the rollup tables once if orders exist but a rollup is empty."""
+    with app.app_context():
+        if db.session.execute(select(Order.id).limit(1)).first() is None:
+            return
+        for model in (DailyRevenue, StatusRevenue, ProductSales):
+            if db.session.execute(select(model).limit(1)).first() is None:
+                app.logger.info('Rebuilding sales rollups: %s is empty', model.__tablename__)
+                rebuild()
+                db.session.commit()
+                return
+
+
+def rebuild():
+    """Recompute the rollups from the orders tables.
+    
+    Runs in the current transaction; the caller commits.
+    """
+    db.session.execute(delete(DailyRevenue))
+    db.session.execute(delete(StatusRevenue))
+    db.session.execute(delete(ProductSales))
+    
+    day = day_of(Order.created_at)
+    if sharding.get_shards() is not None:
+        _rebuild_from_shards(day)
+        return
+    db.session.execute(
+        DailyRevenue.__table__.insert().from_select(
+            ['day', 'status', 'order_count', 'revenue'],
+            select(day, Order.status, func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0.0))
+            .group_by(day, Order.status)
+        )
+    )
+    db.session.execute(
+        StatusRevenue.__table__.insert().from_select(
+            ['status', 'order_count', 'revenue'],
+            select(DailyRevenue.status, func.sum(DailyRevenue.order_count), func.sum(DailyRevenue.revenue))
+            .group_by(DailyRevenue.status)
+        )
+    )
+    db.session.execute(
+        ProductSales.__table__.insert().from_select(
+            ['product_id', 'units_sold', 'revenue'],
+            select(OrderItem.product_id, func.sum(OrderItem.quantity), func.sum(OrderItem.subtotal))
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(Order.status != Order.STATUS_CANCELLED)
+            .group_by(OrderItem.product_id)
+        )
+    )
+
+
+def _rebuild_from_shards(day):
+    """Sum per-shard aggregates in Python; INSERT ... SELECT cannot read other databases."""
+    per_day = db.session.execute(
+        select(day, Order.status, func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0.0))
+        .group_by(day, Order.status)
+    )
+    record_orders(
+        (order_day, None, status, count, revenue)
+        for order_day, status, count, revenue in per_day
+    )
+    
+    sales = defaultdict(lambda: (0, 0.0))
+    rows = db.session.execute(
+        select(OrderItem.product_id, func.sum(OrderItem.quantity), func.sum(OrderItem.subtotal))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status != Order.STATUS_CANCELLED)
+        .group_by(OrderItem.product_id)
+    )
+    for product_id, units, revenue in rows:
+        total_units, total_revenue = sales[product_id]
+        sales[product_id] = (total_units + units, total_revenue + revenue)
+    record_product_sales(sales)
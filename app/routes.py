@@ -1,10 +1,42 @@
 """API routes for the order management system."""
-from flask import Blueprint, request, jsonify
-from app.services import ProductService, OrderService
+import json
+import queue
+import time
+from datetime import date
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from app import batch
+from app.models import db, Order
+from app.services import ConcurrencyConflict, ProductService, OrderService, EventService, ReportService
 
 api_bp = Blueprint('api', __name__)
 
 
+def _serialize(result):
+    return result.to_dict() if hasattr(result, 'to_dict') else result
+
+
+def _write(service_method, *args, **kwargs):
+    """Run a write through the service layer and return its serialized result.
+    
+    With group commit enabled the call runs in the committer thread and is
+    committed together with concurrent writes; the result is serialized
+    there, before the committer's session is closed. Inside an atomic batch
+    the session already holds the batch's transaction, so the call runs
+    inline.
+    """
+    committer = current_app.extensions.get('group_commit')
+    if committer is None or db.session.info.get('defer_commit'):
+        return _serialize(service_method(*args, **kwargs))
+    return committer.submit(lambda: _serialize(service_method(*args, **kwargs)))
+
+
+@api_bp.errorhandler(ConcurrencyConflict)
+def concurrency_conflict(e):
+    """A write lost to concurrent changes even after retrying; the client may retry."""
+    return jsonify({'error': str(e)}), 409
+
+
 # Health check
 @api_bp.route('/health', methods=['GET'])
 def health_check():
@@ -20,6 +52,39 @@ def get_products():
     return jsonify([p.to_dict() for p in products]), 200
 
 
+@api_bp.route('/products/search', methods=['GET'])
+def search_products():
+    """Search products by name (prefix match on every word), paginated."""
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 20))
+        result = ProductService.search_products(request.args.get('q', ''), page, per_page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    result['items'] = [p.to_dict() for p in result['items']]
+    return jsonify(result), 200
+
+
+@api_bp.route('/products/low-stock', methods=['GET'])
+def get_low_stock_products():
+    """Get products low on stock.
+    
+    Query parameters:
+        threshold: Products with stock below this value; without it, products
+            below their own reorder threshold
+    """
+    threshold = request.args.get('threshold')
+    try:
+        threshold = int(threshold) if threshold is not None else None
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({'error': 'threshold and limit must be integers'}), 400
+    if not 1 <= limit <= 1000:
+        return jsonify({'error': 'limit must be between 1 and 1000'}), 400
+    products = ProductService.get_low_stock_products(threshold, limit)
+    return jsonify([p.to_dict() for p in products]), 200
+
+
 @api_bp.route('/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     """Get a specific product."""
@@ -37,12 +102,32 @@ def create_product():
         return jsonify({'error': 'No data provided'}), 400
     
     try:
-        product = ProductService.create_product(
+        product = _write(
+            ProductService.create_product,
             name=data.get('name'),
             price=data.get('price', 0),
             stock=data.get('stock', 0)
         )
-        return jsonify(product.to_dict()), 201
+        return jsonify(product), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@api_bp.route('/products/<int:product_id>', methods=['PATCH'])
+def update_product(product_id):
+    """Update product name and/or price."""
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    try:
+        product = _write(
+            ProductService.update_product,
+            product_id,
+            name=data.get('name'),
+            price=data.get('price')
+        )
+        return jsonify(product), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
@@ -55,8 +140,22 @@ def update_product_stock(product_id):
         return jsonify({'error': 'quantity_change is required'}), 400
     
     try:
-        product = ProductService.update_stock(product_id, data['quantity_change'])
-        return jsonify(product.to_dict()), 200
+        product = _write(ProductService.update_stock, product_id, data['quantity_change'])
+        return jsonify(product), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@api_bp.route('/products/<int:product_id>/reorder-threshold', methods=['PATCH'])
+def update_reorder_threshold(product_id):
+    """Set a product's reorder threshold (null to use the default)."""
+    data = request.get_json()
+    if not data or 'reorder_threshold' not in data:
+        return jsonify({'error': 'reorder_threshold is required'}), 400
+    
+    try:
+        product = _write(ProductService.set_reorder_threshold, product_id, data['reorder_threshold'])
+        return jsonify(product), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
@@ -73,12 +172,91 @@ def get_orders():
     return jsonify([o.to_dict() for o in orders]), 200
 
 
+@api_bp.route('/orders/stream', methods=['GET'])
+def stream_orders():
+    """Stream order status changes as Server-Sent Events.
+    
+    Query parameters:
+        status: Comma-separated statuses; only orders entering or leaving
+            one of them are sent (default: all changes)
+    
+    Reconnecting clients send ``Last-Event-ID`` to replay missed events.
+    """
+    statuses = [s for s in request.args.get('status', '').split(',') if s]
+    invalid = [s for s in statuses if s not in Order.VALID_STATUSES]
+    if invalid:
+        return jsonify({'error': f"Invalid status: {', '.join(invalid)}"}), 400
+    try:
+        last_event_id = request.headers.get('Last-Event-ID')
+        after = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Last-Event-ID must be an integer'}), 400
+    
+    broadcaster = current_app.extensions['order_broadcaster']
+    subscriber = broadcaster.subscribe(statuses, after)
+    heartbeat = current_app.config['SSE_HEARTBEAT_SECONDS']
+    # The stream itself never touches the database
+    db.session.close()
+    
+    def generate():
+        try:
+            yield f'retry: {int(heartbeat * 1000)}\n\n'
+            while True:
+                if subscriber.overflowed and subscriber.events.empty():
+                    # Too slow to keep up: reconnect with Last-Event-ID to catch up
+                    yield 'event: overflow\ndata: {}\n\n'
+                    return
+                try:
+                    event = subscriber.events.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield (f"id: {event['seq']}\nevent: {event['type']}\n"
+                       f"data: {json.dumps(event['payload'])}\n\n")
+        finally:
+            broadcaster.unsubscribe(subscriber)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@api_bp.route('/orders/expiry', methods=['GET'])
+def get_order_expiry():
+    """Get the reservation TTL and what the expiry sweeper has released so far."""
+    sweeper = current_app.extensions.get('reservation_sweeper')
+    metrics = {
+        'enabled': sweeper is not None,
+        'ttl_minutes': current_app.config['ORDER_RESERVATION_TTL_MINUTES'],
+    }
+    if sweeper is not None:
+        metrics.update(sweeper.metrics())
+    return jsonify(metrics), 200
+
+
 @api_bp.route('/orders/<int:order_id>', methods=['GET'])
 def get_order(order_id):
-    """Get a specific order."""
+    """Get a specific order.
+    
+    With the response cache enabled, completed and cancelled orders are
+    served from it with an immutable ``Cache-Control`` header.
+    """
+    cache = current_app.extensions.get('order_response_cache')
+    if db.session.info.get('defer_commit'):
+        # Inside an atomic batch: the order may have uncommitted changes
+        cache = None
+    if cache is not None:
+        response = cache.get(order_id)
+        if response is not None:
+            return response
+        generation = cache.generation
     order = OrderService.get_order(order_id)
     if not order:
         return jsonify({'error': 'Order not found'}), 404
+    if cache is not None:
+        return cache.put(order, generation), 200
     return jsonify(order.to_dict()), 200
 
 
@@ -90,12 +268,13 @@ def create_order():
         return jsonify({'error': 'No data provided'}), 400
     
     try:
-        order = OrderService.create_order(
+        order = _write(
+            OrderService.create_order,
             customer_name=data.get('customer_name'),
             customer_email=data.get('customer_email'),
             items=data.get('items', [])
         )
-        return jsonify(order.to_dict()), 201
+        return jsonify(order), 201
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
@@ -104,8 +283,8 @@ def create_order():
 def confirm_order(order_id):
     """Confirm a pending order."""
     try:
-        order = OrderService.confirm_order(order_id)
-        return jsonify(order.to_dict()), 200
+        order = _write(OrderService.confirm_order, order_id)
+        return jsonify(order), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
@@ -114,8 +293,8 @@ def confirm_order(order_id):
 def cancel_order(order_id):
     """Cancel a pending order."""
     try:
-        order = OrderService.cancel_order(order_id)
-        return jsonify(order.to_dict()), 200
+        order = _write(OrderService.cancel_order, order_id)
+        return jsonify(order), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
@@ -124,7 +303,146 @@ def cancel_order(order_id):
 def complete_order(order_id):
     """Mark an order as completed."""
     try:
-        order = OrderService.complete_order(order_id)
-        return jsonify(order.to_dict()), 200
+        order = _write(OrderService.complete_order, order_id)
+        return jsonify(order), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+# Bulk order endpoints
+def _bulk_transition(service_method):
+    """Run a bulk status transition for the 'order_ids' in the request body."""
+    data = request.get_json()
+    if not data or 'order_ids' not in data:
+        return jsonify({'error': 'order_ids is required'}), 400
+    
+    try:
+        result = _write(service_method, data['order_ids'])
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@api_bp.route('/orders/bulk/confirm', methods=['POST'])
+def bulk_confirm_orders():
+    """Confirm many pending orders at once."""
+    return _bulk_transition(OrderService.bulk_confirm_orders)
+
+
+@api_bp.route('/orders/bulk/cancel', methods=['POST'])
+def bulk_cancel_orders():
+    """Cancel many pending orders at once and restore their stock."""
+    return _bulk_transition(OrderService.bulk_cancel_orders)
+
+
+@api_bp.route('/orders/bulk/complete', methods=['POST'])
+def bulk_complete_orders():
+    """Mark many confirmed orders as completed at once."""
+    return _bulk_transition(OrderService.bulk_complete_orders)
+
+
+# Batch endpoint
+@api_bp.route('/batch', methods=['POST'])
+def run_batch():
+    """Run several API calls in one request, optionally all or nothing."""
+    data = request.get_json()
+    if not data or 'operations' not in data:
+        return jsonify({'error': 'operations is required'}), 400
+    
+    atomic = bool(data.get('atomic', False))
+    try:
+        results = batch.run(data['operations'], atomic)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
+    if atomic and results[-1]['status'] >= 400:
+        failed = len(results) - 1
+        return jsonify({
+            'error': f'Operation {failed} failed, no operation was applied',
+            'failed_operation': failed,
+            'results': results
+        }), results[-1]['status']
+    return jsonify({'results': results}), 200
+
+
+# Report endpoints
+@api_bp.route('/reports/daily-revenue', methods=['GET'])
+def get_daily_revenue():
+    """Get order count and revenue per day and status.
+    
+    Query parameters:
+        from, to: Inclusive day range (YYYY-MM-DD)
+        status: Only this order status
+    """
+    try:
+        date_from = request.args.get('from')
+        date_to = request.args.get('to')
+        date_from = date.fromisoformat(date_from) if date_from else None
+        date_to = date.fromisoformat(date_to) if date_to else None
+    except ValueError:
+        return jsonify({'error': 'from and to must be dates (YYYY-MM-DD)'}), 400
+    
+    rows = ReportService.get_daily_revenue(date_from, date_to, request.args.get('status'))
+    return jsonify([r.to_dict() for r in rows]), 200
+
+
+@api_bp.route('/reports/revenue-by-status', methods=['GET'])
+def get_revenue_by_status():
+    """Get total order count and revenue per status."""
+    return jsonify([r.to_dict() for r in ReportService.get_revenue_by_status()]), 200
+
+
+@api_bp.route('/reports/top-products', methods=['GET'])
+def get_top_products():
+    """Get the best-selling products by units sold."""
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if not 1 <= limit <= 100:
+        return jsonify({'error': 'limit must be between 1 and 100'}), 400
+    return jsonify([r.to_dict() for r in ReportService.get_top_products(limit)]), 200
+
+
+# Event feed
+@api_bp.route('/events', methods=['GET'])
+def get_events():
+    """Get outbox events after a sequence number, long-polling until one arrives.
+    
+    Query parameters:
+        after: Last sequence number the consumer has processed (default 0)
+        limit: Maximum number of events returned (default 100, max 1000)
+        timeout: Seconds to wait when there are no new events (default 0)
+    """
+    try:
+        after = int(request.args.get('after', 0))
+        limit = int(request.args.get('limit', 100))
+        timeout = float(request.args.get('timeout', 0))
+    except ValueError:
+        return jsonify({'error': 'after, limit and timeout must be numbers'}), 400
+    if after < 0 or limit <= 0 or timeout < 0:
+        return jsonify({'error': 'after, limit and timeout must not be negative'}), 400
+    limit = min(limit, 1000)
+    timeout = min(timeout, current_app.config['OUTBOX_MAX_WAIT'])
+    
+    oldest = EventService.get_oldest_seq()
+    if after and oldest is not None and after + 1 < oldest:
+        # The consumer missed events that were already pruned
+        return jsonify({'error': 'Events after this sequence were pruned', 'oldest_seq': oldest}), 410
+    
+    notifier = current_app.extensions['event_notifier']
+    poll_interval = current_app.config['OUTBOX_POLL_INTERVAL']
+    deadline = time.monotonic() + timeout
+    while True:
+        version = notifier.version
+        events = EventService.get_events(after, limit)
+        remaining = deadline - time.monotonic()
+        if events or remaining <= 0:
+            break
+        # Give the connection back to the pool while waiting
+        db.session.close()
+        notifier.wait(version, min(remaining, poll_interval))
+    
+    return jsonify({
+        'events': [e.to_dict() for e in events],
+        'next_after': events[-1].seq if events else after
+    }), 200
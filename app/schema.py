@@ -0,0 +1,53 @@
+"""Upgrades of existing databases to the current schema.
+
+``db.create_all`` creates missing tables but never changes the tables a
+database already has. Columns added to existing tables are listed in
+``COLUMNS``; ``upgrade`` adds the ones a database lacks and then creates
+any missing index of the models, so a database created by an older version
+keeps working after an update. It runs at startup for the central database
+and for every order shard.
+"""
+from sqlalchemy import inspect
+
+# (table, column, value for existing rows) in the order they were added;
+# the type comes from the model, NOT NULL columns need a value
+COLUMNS = [
+    ('products', 'reorder_threshold', None),
+    ('products', 'low_stock_since', None),
+    ('orders', 'version', 1),
+    ('products', 'version', 1),
+    ('order_items', 'product_name', None),
+]
+
+
+def upgrade(engine, metadata):
+    """Add the missing columns and indexes to the tables of ``engine``'s database.
+
+    Returns:
+        List of what was added, e.g. 'products.reorder_threshold'
+    """
+    added = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        tables = set(inspector.get_table_names())
+        for table_name, column_name, default in COLUMNS:
+            if table_name not in tables:
+                continue
+            if column_name in {c['name'] for c in inspector.get_columns(table_name)}:
+                continue
+            column = metadata.tables[table_name].c[column_name]
+            definition = f'{column_name} {column.type.compile(connection.dialect)}'
+            if not column.nullable:
+                definition += f' NOT NULL DEFAULT {default}'
+            connection.exec_driver_sql(f'ALTER TABLE {table_name} ADD COLUMN {definition}')
+            added.append(f'{table_name}.{column_name}')
+
+        for table in metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name not in existing:
+                    index.create(connection)
+                    added.append(index.name)
+    return added
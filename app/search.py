@@ -0,0 +1,109 @@
+"""Product name search.
+
+On SQLite builds with FTS5, product names are indexed in the
+``products_fts`` external-content table. Triggers on ``products`` keep it
+in sync for every insert, delete and rename, whichever code path makes
+the change, and stock updates do not touch the index at all. Prefix
+indexes for 2- and 3-character prefixes keep type-ahead queries fast on
+large catalogs.
+
+Other databases, and SQLite builds without FTS5, fall back to LIKE
+patterns that match the same word prefixes. They cannot use an index and
+scan ``products``, so they suit small catalogs only.
+"""
+import re
+
+from sqlalchemy import or_, select, text
+from sqlalchemy.exc import OperationalError
+
+from app.models import db, Product
+
+_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name,
+        content='products',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_rename AFTER UPDATE OF name ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO products_fts(rowid, name) VALUES (new.id, new.name);
+    END""",
+]
+
+_SEARCH = text("""
+    SELECT products.* FROM products_fts
+    JOIN products ON products.id = products_fts.rowid
+    WHERE products_fts MATCH :query
+    ORDER BY products_fts.rank, products.id
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def init_app(app):
+    """Create the FTS5 index if the database supports it.
+
+    Products that existed before the index was created are indexed once.
+    Sets ``app.extensions['product_search_fts5']`` to tell search queries
+    which strategy to use.
+    """
+    fts5 = False
+    if db.engine.dialect.name == 'sqlite':
+        try:
+            with db.engine.begin() as connection:
+                created = connection.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+                ).first() is None
+                for statement in _SCHEMA:
+                    connection.exec_driver_sql(statement)
+                if created:
+                    connection.exec_driver_sql(
+                        "INSERT INTO products_fts(products_fts) VALUES ('rebuild')"
+                    )
+            fts5 = True
+        except OperationalError:
+            app.logger.warning('SQLite FTS5 is not available, using prefix search')
+    app.extensions['product_search_fts5'] = fts5
+
+
+def _terms(query):
+    return re.findall(r'\w+', query)
+
+
+def search_products(query, limit, offset, fts5):
+    """Find products whose name contains words starting with the query terms.
+
+    Returns:
+        List of products, best matches first
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    if fts5:
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return db.session.scalars(
+            select(Product).from_statement(_SEARCH),
+            {'query': match, 'limit': limit, 'offset': offset}
+        ).all()
+
+    # SQLite's LIKE already ignores ASCII case; ILIKE would wrap both sides in lower()
+    like = Product.name.like if db.engine.dialect.name == 'sqlite' else Product.name.ilike
+    words = []
+    for term in terms:
+        term = term.replace('_', '\\_')
+        words.append(or_(like(f'{term}%', escape='\\'), like(f'% {term}%', escape='\\')))
+    return db.session.scalars(
+        select(Product)
+        .where(*words)
+        .order_by(Product.name, Product.id)
+        .limit(limit)
+        .offset(offset)
+    ).all()
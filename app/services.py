@@ -1,5 +1,209 @@
 """Business logic services for the order management system."""
-from app.models import db, Product, Order, OrderItem
+import functools
+import heapq
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, bindparam, case, func, or_, select, update
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import cache, rollups, search, sharding
+from app.events import record_event, record_events
+from app.models import db, Product, Order, OrderItem, OutboxEvent, DailyRevenue, ProductSales, StatusRevenue
+
+# Ids per guarded UPDATE; keeps IN (...) lists well below SQLite's
+# bound-parameter limit.
+BULK_CHUNK_SIZE = 500
+
+# Rows loaded (and related rows eager-loaded) per round trip by the iter_* reads
+ITER_BATCH_SIZE = 1000
+
+# Loads everything Order.to_dict() needs in one extra query instead of one
+# query per order. Items carry the product name they were ordered with, so
+# products are neither joined nor loaded (they may live on another database
+# when orders are sharded).
+WITH_ITEMS = selectinload(Order.items)
+
+# Hot lookups are built once, with bound parameters for the values that
+# change between calls. A statement object keeps its cache key, so each
+# call goes straight to the compiled-SQL cache without building or hashing
+# the statement again.
+_ALL_PRODUCTS = select(Product)
+_PRODUCTS_BY_ID = select(Product).where(Product.id.in_(bindparam('ids', expanding=True)))
+_PRODUCT_NAMES = select(Product.id, Product.name).where(Product.id.in_(bindparam('ids', expanding=True)))
+_ALL_ORDERS = select(Order).options(WITH_ITEMS)
+_ORDERS_BY_STATUS = _ALL_ORDERS.where(Order.status == bindparam('status'))
+# Per-shard variants, ordered so the shards' results can be merged
+_SHARDED_ORDERS = select(Order).options(WITH_ITEMS).order_by(Order.created_at, Order.id)
+_SHARDED_ORDERS_BY_STATUS = _SHARDED_ORDERS.where(Order.status == bindparam('status'))
+# Oldest pending orders placed before a cutoff (index on status, created_at)
+_STALE_ORDERS = (
+    select(Order.id, Order.created_at)
+    .where(Order.status == Order.STATUS_PENDING, Order.created_at < bindparam('before'))
+    .order_by(Order.created_at, Order.id)
+    .limit(bindparam('limit'))
+)
+
+
+def _order_sort_key(order):
+    return order.created_at, order.id
+
+
+def _iterate(statement, params=None, batch_size=ITER_BATCH_SIZE, bind_arguments=None):
+    """Yield the objects of an ORM query, loading ``batch_size`` rows at a time.
+    
+    Rows are streamed with ``yield_per`` and selectin-loaded relationships
+    are fetched once per batch. When the caller moves past a batch, its
+    objects are expunged from the session, so memory is bounded by the
+    batch size rather than by the number of rows.
+    """
+    result = db.session.scalars(
+        statement.execution_options(yield_per=batch_size), params,
+        bind_arguments=bind_arguments
+    )
+    try:
+        for batch in result.partitions():
+            yield from batch
+            for obj in batch:
+                if obj in db.session:
+                    db.session.expunge(obj)
+    finally:
+        result.close()
+
+
+def _iterate_orders(statement, sharded_statement, params, batch_size):
+    shards = sharding.get_shards()
+    if shards is None:
+        return _iterate(statement, params, batch_size)
+    # One stream per shard, merged lazily; memory stays at a batch per shard
+    return heapq.merge(*(
+        _iterate(sharded_statement, params, batch_size, {'shard_id': shard})
+        for shard in range(len(shards))
+    ), key=_order_sort_key)
+
+
+def _chunks(values, size):
+    """Yield consecutive slices of ``values`` with at most ``size`` elements."""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _commit():
+    """Commit the current unit of work.
+    
+    When a caller owns the transaction (see ``app.group_commit``) the
+    session is marked with ``defer_commit`` and the work is only flushed;
+    the owner commits or rolls back on its behalf.
+    """
+    if db.session.info.get('defer_commit'):
+        db.session.flush()
+    else:
+        db.session.commit()
+
+
+def _rollback():
+    """Roll back the current unit of work unless the caller owns the transaction."""
+    if not db.session.info.get('defer_commit'):
+        db.session.rollback()
+
+
+class ConcurrencyConflict(Exception):
+    """A write kept losing to concurrent changes of the same rows."""
+
+
+def _retry_on_conflict(method):
+    """Re-run a service call whose rows were changed concurrently.
+    
+    ``Order`` and ``Product`` carry a version column: an UPDATE of a row
+    that changed since it was read matches nothing and the flush raises
+    ``StaleDataError``. The call is then rolled back and run again on fresh
+    data, up to ``OPTIMISTIC_LOCK_RETRIES`` times with a short random
+    backoff, before giving up with ``ConcurrencyConflict``. When the caller
+    owns the transaction (``defer_commit``) there is nothing to retry in and
+    the conflict is raised straight away.
+    """
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        retries = current_app.config['OPTIMISTIC_LOCK_RETRIES']
+        for attempt in range(retries + 1):
+            try:
+                return method(*args, **kwargs)
+            except StaleDataError as e:
+                if db.session.info.get('defer_commit') or attempt == retries:
+                    _rollback()
+                    raise ConcurrencyConflict(
+                        "The resource was modified concurrently, please retry"
+                    ) from e
+                db.session.rollback()
+                time.sleep(random.uniform(0, 0.002 * 2 ** attempt))
+    return wrapper
+
+
+def _normalize_ids(ids):
+    """Validate a list of ids and drop duplicates, keeping the given order."""
+    if not isinstance(ids, list) or not ids:
+        raise ValueError("order_ids must be a non-empty list")
+    if not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError("order_ids must contain only integers")
+    return list(dict.fromkeys(ids))
+
+
+def _order_event(event_type, order_id, status, previous_status):
+    return {
+        'event_type': event_type,
+        'aggregate_type': 'order',
+        'aggregate_id': order_id,
+        'payload': {'id': order_id, 'status': status, 'previous_status': previous_status}
+    }
+
+
+_TRANSITION_EVENTS = {
+    Order.STATUS_CONFIRMED: OutboxEvent.ORDER_CONFIRMED,
+    Order.STATUS_CANCELLED: OutboxEvent.ORDER_CANCELLED,
+    Order.STATUS_COMPLETED: OutboxEvent.ORDER_COMPLETED,
+}
+
+
+def _record_transition(order, previous_status):
+    """Record the outbox event, rollup change and cache invalidation for a single order status change."""
+    record_event(**_order_event(
+        _TRANSITION_EVENTS[order.status], order.id, order.status, previous_status
+    ))
+    rollups.record_order_status(order, previous_status)
+    cache.invalidate_orders([order.id])
+
+
+def _track_low_stock(products):
+    """Flag products that just fell below their reorder threshold.
+    
+    Only the products whose stock was changed by the current operation are
+    checked, so the watchlist is maintained without rescanning the catalog.
+    Products back above their threshold are unflagged.
+    """
+    default = current_app.config['LOW_STOCK_DEFAULT_THRESHOLD']
+    for product in products:
+        low = product.is_low_stock(default)
+        if low and product.low_stock_since is None:
+            product.low_stock_since = datetime.utcnow()
+            record_event(OutboxEvent.PRODUCT_LOW_STOCK, 'product', product.id, {
+                'id': product.id, 'stock': product.stock,
+                'reorder_threshold': product.reorder_threshold
+            })
+        elif not low and product.low_stock_since is not None:
+            product.low_stock_since = None
+
+
+def _sales_of(order):
+    """Units and revenue per product in an order, for the sales rollup."""
+    sales = defaultdict(lambda: (0, 0.0))
+    for item in order.items:
+        units, revenue = sales[item.product_id]
+        sales[item.product_id] = (units + item.quantity, revenue + item.subtotal)
+    return sales
 
 
 class ProductService:
@@ -17,13 +221,41 @@ class ProductService:
         
         product = Product(name=name.strip(), price=price, stock=stock)
         db.session.add(product)
-        db.session.commit()
+        db.session.flush()
+        record_event(OutboxEvent.PRODUCT_CREATED, 'product', product.id, product.to_dict())
+        _track_low_stock([product])
+        _commit()
         return product
     
     @staticmethod
+    @_retry_on_conflict
+    def update_product(product_id, name=None, price=None):
+        """Update product name and/or price."""
+        if name is None and price is None:
+            raise ValueError("name or price is required")
+        product = db.session.get(Product, product_id)
+        if not product:
+            raise ValueError("Product not found")
+        if name is not None:
+            if not name.strip():
+                raise ValueError("Product name is required")
+            product.name = name.strip()
+        if price is not None:
+            if price <= 0:
+                raise ValueError("Price must be greater than zero")
+            product.price = price
+        
+        record_event(OutboxEvent.PRODUCT_UPDATED, 'product', product.id, {
+            'id': product.id, 'name': product.name, 'price': product.price
+        })
+        _commit()
+        return product
+    
+    @staticmethod
+    @_retry_on_conflict
     def update_stock(product_id, quantity_change):
         """Update product stock. Positive = add, negative = subtract."""
-        product = Product.query.get(product_id)
+        product = db.session.get(Product, product_id)
         if not product:
             raise ValueError("Product not found")
         
@@ -32,24 +264,143 @@ class ProductService:
             raise ValueError("Insufficient stock")
         
         product.stock = new_stock
-        db.session.commit()
+        record_event(OutboxEvent.PRODUCT_STOCK_CHANGED, 'product', product.id, {
+            'id': product.id, 'stock': new_stock, 'change': quantity_change
+        })
+        _track_low_stock([product])
+        _commit()
+        return product
+    
+    @staticmethod
+    @_retry_on_conflict
+    def set_reorder_threshold(product_id, threshold):
+        """Set the stock level below which a product is reported as low on stock.
+        
+        Args:
+            threshold: Non-negative integer, or None to use the default threshold
+        """
+        if threshold is not None and (
+            not isinstance(threshold, int) or isinstance(threshold, bool) or threshold < 0
+        ):
+            raise ValueError("reorder_threshold must be a non-negative integer")
+        product = db.session.get(Product, product_id)
+        if not product:
+            raise ValueError("Product not found")
+        
+        product.reorder_threshold = threshold
+        record_event(OutboxEvent.PRODUCT_UPDATED, 'product', product.id, {
+            'id': product.id, 'reorder_threshold': threshold
+        })
+        _track_low_stock([product])
+        _commit()
         return product
     
+    @staticmethod
+    def recompute_low_stock():
+        """Flag and unflag all products against the current thresholds.
+        
+        The watchlist is otherwise only updated for products whose stock or
+        threshold changes; this brings products that existed before it, or
+        before ``LOW_STOCK_DEFAULT_THRESHOLD`` changed, up to date with one
+        UPDATE. Newly flagged products get a ``product.low_stock`` event.
+        
+        Returns:
+            Number of products flagged or unflagged
+        """
+        default = current_app.config['LOW_STOCK_DEFAULT_THRESHOLD']
+        threshold = Product.reorder_threshold
+        if default is not None:
+            threshold = func.coalesce(threshold, default)
+        low = and_(threshold.isnot(None), Product.stock < threshold)
+        flagged = Product.low_stock_since.isnot(None)
+        stale = or_(and_(low, ~flagged), and_(~low, flagged))
+        
+        newly_low = db.session.execute(
+            select(Product.id, Product.stock, Product.reorder_threshold).where(low, ~flagged)
+        ).all()
+        result = db.session.execute(
+            update(Product).where(stale).values(low_stock_since=case((low, datetime.utcnow()))),
+            execution_options={'synchronize_session': False}
+        )
+        record_events([
+            {'event_type': OutboxEvent.PRODUCT_LOW_STOCK, 'aggregate_type': 'product',
+             'aggregate_id': row.id,
+             'payload': {'id': row.id, 'stock': row.stock, 'reorder_threshold': row.reorder_threshold}}
+            for row in newly_low
+        ])
+        _commit()
+        return result.rowcount
+    
+    @staticmethod
+    def get_low_stock_products(threshold=None, limit=100):
+        """Get products low on stock, lowest stock first.
+        
+        Args:
+            threshold: Return products with stock below this value; without
+                it, return products flagged against their own reorder threshold
+        """
+        if threshold is not None:
+            stmt = select(Product).where(Product.stock < threshold).order_by(Product.stock, Product.id)
+        else:
+            stmt = (
+                select(Product)
+                .where(Product.low_stock_since.isnot(None))
+                .order_by(Product.low_stock_since, Product.id)
+            )
+        return db.session.scalars(stmt.limit(limit)).all()
+    
     @staticmethod
     def get_all_products():
         """Get all products."""
-        return Product.query.all()
+        return db.session.scalars(_ALL_PRODUCTS).all()
+    
+    @staticmethod
+    def iter_all_products(batch_size=ITER_BATCH_SIZE):
+        """Iterate over all products with bounded memory.
+        
+        Products are detached from the session once their batch has been
+        consumed; read what you need while iterating.
+        """
+        return _iterate(_ALL_PRODUCTS, batch_size=batch_size)
     
     @staticmethod
     def get_product(product_id):
         """Get product by ID."""
-        return Product.query.get(product_id)
+        return db.session.get(Product, product_id)
+    
+    @staticmethod
+    def search_products(query, page=1, per_page=20):
+        """Search products by name, best matches first.
+        
+        Every word of the query matches words in the product name that start
+        with it, so partial input ("lap pro") finds "Laptop Pro 14".
+        
+        Returns:
+            Dict with 'items' (products), 'page', 'per_page' and 'has_more'
+        """
+        if not query or not query.strip():
+            raise ValueError("Search query is required")
+        if page < 1 or not 1 <= per_page <= 100:
+            raise ValueError("page must be >= 1 and per_page between 1 and 100")
+        
+        # One extra row tells whether there is a next page without counting matches
+        products = search.search_products(
+            query, per_page + 1, (page - 1) * per_page,
+            current_app.extensions['product_search_fts5']
+        )
+        return {
+            'items': products[:per_page],
+            'page': page,
+            'per_page': per_page,
+            'has_more': len(products) > per_page
+        }
 
 
 class OrderService:
     """Service for order-related business operations."""
     
     @staticmethod
+    @_retry_on_conflict
     def create_order(customer_name, customer_email, items):
         """
         Create a new order with items.
@@ -72,6 +423,12 @@ class OrderService:
         if not items:
             raise ValueError("Order must contain at least one item")
         
+        # Load every product in one query before the order joins the session
+        # (no autoflush); the per-item lookups below are identity-map hits.
+        products = db.session.scalars(
+            _PRODUCTS_BY_ID, {'ids': [item['product_id'] for item in items]}
+        ).all()
+        
         order = Order(
             customer_name=customer_name.strip(),
             customer_email=customer_email.strip()
@@ -79,18 +436,18 @@ class OrderService:
         db.session.add(order)
         
         for item_data in items:
-            product = Product.query.get(item_data['product_id'])
+            product = db.session.get(Product, item_data['product_id'])
             if not product:
-                db.session.rollback()
+                _rollback()
                 raise ValueError(f"Product {item_data['product_id']} not found")
             
             quantity = item_data['quantity']
             if quantity <= 0:
-                db.session.rollback()
+                _rollback()
                 raise ValueError("Quantity must be positive")
             
             if not product.is_available(quantity):
-                db.session.rollback()
+                _rollback()
                 raise ValueError(f"Insufficient stock for product {product.name}")
             
             # Reserve stock
@@ -99,6 +456,7 @@ class OrderService:
             order_item = OrderItem(
                 order=order,
                 product=product,
+                product_name=product.name,
                 quantity=quantity,
                 unit_price=product.price,
                 subtotal=product.price * quantity
@@ -106,63 +464,437 @@ class OrderService:
             db.session.add(order_item)
         
         order.calculate_total()
-        db.session.commit()
+        _track_low_stock({item.product for item in order.items})
+        db.session.flush()
+        record_event(OutboxEvent.ORDER_CREATED, 'order', order.id, {
+            'id': order.id, 'status': order.status, 'previous_status': None,
+            'order': order.to_dict()
+        })
+        rollups.record_order_status(order, None)
+        rollups.record_product_sales(_sales_of(order))
+        _commit()
         return order
     
     @staticmethod
+    @_retry_on_conflict
     def confirm_order(order_id):
         """Confirm a pending order."""
-        order = Order.query.get(order_id)
+        order = db.session.get(Order, order_id, options=[WITH_ITEMS])
         if not order:
             raise ValueError("Order not found")
         if order.status != Order.STATUS_PENDING:
             raise ValueError("Only pending orders can be confirmed")
         
         order.status = Order.STATUS_CONFIRMED
-        db.session.commit()
+        _record_transition(order, Order.STATUS_PENDING)
+        _commit()
         return order
     
     @staticmethod
+    @_retry_on_conflict
     def cancel_order(order_id):
         """Cancel an order and restore stock."""
-        order = Order.query.get(order_id)
+        order = db.session.get(Order, order_id, options=[WITH_ITEMS])
         if not order:
             raise ValueError("Order not found")
         if not order.can_be_cancelled():
             raise ValueError("Only pending orders can be cancelled")
         
-        # Restore stock for all items
-        for item in order.items:
-            item.product.stock += item.quantity
-        
         order.status = Order.STATUS_CANCELLED
-        db.session.commit()
+        _record_transition(order, Order.STATUS_PENDING)
+        db.session.flush()
+        OrderService._release_stock(_sales_of(order))
+        _commit()
         return order
     
     @staticmethod
+    @_retry_on_conflict
     def complete_order(order_id):
         """Mark order as completed (delivered)."""
-        order = Order.query.get(order_id)
+        order = db.session.get(Order, order_id, options=[WITH_ITEMS])
         if not order:
             raise ValueError("Order not found")
         if not order.can_be_completed():
             raise ValueError("Only confirmed orders can be completed")
         
         order.status = Order.STATUS_COMPLETED
-        db.session.commit()
+        _record_transition(order, Order.STATUS_CONFIRMED)
+        _commit()
         return order
     
     @staticmethod
     def get_order(order_id):
         """Get order by ID."""
-        return Order.query.get(order_id)
+        return db.session.get(Order, order_id, options=[WITH_ITEMS])
     
     @staticmethod
     def get_all_orders():
-        """Get all orders."""
-        return Order.query.all()
+        """Get all orders.
+        
+        With order shards, every shard is queried in parallel and the
+        results are merged oldest first.
+        """
+        shards = sharding.get_shards()
+        if shards is not None:
+            return shards.gather(_SHARDED_ORDERS, key=_order_sort_key)
+        return db.session.scalars(_ALL_ORDERS).all()
     
     @staticmethod
     def get_orders_by_status(status):
         """Get orders filtered by status."""
-        return Order.query.filter_by(status=status).all()
+        shards = sharding.get_shards()
+        if shards is not None:
+            return shards.gather(_SHARDED_ORDERS_BY_STATUS, {'status': status}, key=_order_sort_key)
+        return db.session.scalars(_ORDERS_BY_STATUS, {'status': status}).all()
+    
+    @staticmethod
+    def iter_all_orders(batch_size=ITER_BATCH_SIZE):
+        """Iterate over all orders, with their items, in bounded memory.
+        
+        For jobs and exports over the whole table. Orders are detached from
+        the session once their batch has been consumed; read what you need
+        while iterating.
+        """
+        return _iterate_orders(_ALL_ORDERS, _SHARDED_ORDERS, None, batch_size)
+    
+    @staticmethod
+    def iter_orders_by_status(status, batch_size=ITER_BATCH_SIZE):
+        """Iterate over orders with the given status in bounded memory."""
+        return _iterate_orders(
+            _ORDERS_BY_STATUS, _SHARDED_ORDERS_BY_STATUS, {'status': status}, batch_size
+        )
+    
+    @staticmethod
+    def bulk_confirm_orders(order_ids):
+        """Confirm many pending orders at once.
+        
+        Returns:
+            Dict with 'transitioned' ids and 'rejected' entries ({'id', 'error'})
+        """
+        result = OrderService._bulk_transition(
+            order_ids, Order.STATUS_PENDING, Order.STATUS_CONFIRMED,
+            "Only pending orders can be confirmed"
+        )
+        _commit()
+        return result
+    
+    @staticmethod
+    def bulk_complete_orders(order_ids):
+        """Mark many confirmed orders as completed at once."""
+        result = OrderService._bulk_transition(
+            order_ids, Order.STATUS_CONFIRMED, Order.STATUS_COMPLETED,
+            "Only confirmed orders can be completed"
+        )
+        _commit()
+        return result
+    
+    @staticmethod
+    def bulk_cancel_orders(order_ids):
+        """Cancel many pending orders at once and restore their stock.
+        
+        Stock is returned with one aggregated update per product rather
+        than one per order item.
+        """
+        result = OrderService._bulk_transition(
+            order_ids, Order.STATUS_PENDING, Order.STATUS_CANCELLED,
+            "Only pending orders can be cancelled"
+        )
+        OrderService._restore_stock(result['transitioned'])
+        _commit()
+        return result
+    
+    @staticmethod
+    def expire_stale_orders(older_than, batch_size=BULK_CHUNK_SIZE, max_batches=None):
+        """Cancel pending orders placed before ``older_than`` and release their stock.
+        
+        Orders are expired oldest first, ``batch_size`` at a time, each
+        batch in its own transaction, so a large backlog never holds the
+        write lock for long. Every batch returns its stock with one
+        aggregated update per product. Orders confirmed in the meantime are
+        left alone by the guarded status UPDATE.
+        
+        Args:
+            max_batches: Stop after this many batches (default: until none are left)
+        
+        Returns:
+            Dict with 'expired' (number of orders), 'batches' and 'released'
+            (product_id to units returned to stock)
+        """
+        expired = 0
+        batches = 0
+        released = defaultdict(int)
+        while max_batches is None or batches < max_batches:
+            # Sharded: every shard returns its oldest, the oldest of those go first
+            rows = db.session.execute(_STALE_ORDERS, {'before': older_than, 'limit': batch_size}).all()
+            ids = [order_id for order_id, _ in sorted(rows, key=lambda row: (row[1], row[0]))][:batch_size]
+            if not ids:
+                break
+            result = OrderService._bulk_transition(
+                ids, Order.STATUS_PENDING, Order.STATUS_CANCELLED,
+                "Only pending orders can be cancelled"
+            )
+            for product_id, (units, _) in OrderService._restore_stock(result['transitioned']).items():
+                released[product_id] += units
+            db.session.commit()
+            expired += len(result['transitioned'])
+            batches += 1
+            if len(rows) < batch_size:
+                break
+        return {'expired': expired, 'batches': batches, 'released': dict(released)}
+    
+    @staticmethod
+    def backfill_item_names(batch_size=BULK_CHUNK_SIZE):
+        """Copy the product name onto order items stored without one.
+        
+        Items are walked in id order, ``batch_size`` at a time, and each
+        batch is committed on its own, so a large table is backfilled
+        without holding the write lock for long or rescanning finished
+        rows. With order shards, the shards are backfilled one by one.
+        
+        Returns:
+            Number of items updated
+        """
+        shards = sharding.get_shards()
+        items = OrderItem.__table__
+        set_name = (
+            update(items)
+            .where(items.c.id == bindparam('item_id'))
+            .values(product_name=bindparam('name'))
+        )
+        updated = 0
+        for shard in [None] if shards is None else range(len(shards)):
+            bind_arguments = {} if shard is None else {'shard_id': shard}
+            last_id = 0
+            while True:
+                rows = db.session.execute(
+                    select(OrderItem.id, OrderItem.product_id)
+                    .where(OrderItem.id > last_id, OrderItem.product_name.is_(None))
+                    .order_by(OrderItem.id)
+                    .limit(batch_size),
+                    bind_arguments=bind_arguments
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                names = dict(db.session.execute(
+                    _PRODUCT_NAMES, {'ids': list({row.product_id for row in rows})}
+                ).all())
+                changes = [
+                    {'item_id': row.id, 'name': names[row.product_id]}
+                    for row in rows if row.product_id in names
+                ]
+                if changes:
+                    db.session.execute(set_name, changes, bind_arguments=bind_arguments)
+                db.session.commit()
+                updated += len(changes)
+        return updated
+    
+    @staticmethod
+    def _bulk_transition(order_ids, from_status, to_status, rejection_error):
+        """Move orders from one status to another with guarded UPDATEs.
+        
+        Each chunk of ids is handled by a single
+        ``UPDATE orders SET status=... WHERE id IN (...) AND status=...``,
+        so orders changed concurrently are rejected instead of overwritten.
+        The caller is responsible for committing.
+        """
+        ids = _normalize_ids(order_ids)
+        supports_returning = db.session.get_bind(mapper=Order).dialect.update_returning
+        day = rollups.day_of(Order.created_at)
+        transitioned = set()
+        
+        for chunk in _chunks(ids, BULK_CHUNK_SIZE):
+            guard = (Order.id.in_(chunk), Order.status == from_status)
+            stmt = update(Order).where(*guard).values(status=to_status, version=Order.version + 1)
+            options = {'synchronize_session': False}
+            if supports_returning:
+                rows = db.session.execute(stmt.returning(Order.id), execution_options=options)
+                moved = rows.scalars().all()
+            else:
+                moved = db.session.scalars(select(Order.id).where(*guard)).all()
+                if moved:
+                    db.session.execute(
+                        stmt.where(Order.id.in_(moved)), execution_options=options
+                    )
+            if not moved:
+                continue
+            transitioned.update(moved)
+            per_day = db.session.execute(
+                select(day, func.count(Order.id), func.sum(Order.total_amount))
+                .where(Order.id.in_(moved))
+                .group_by(day)
+            )
+            rollups.record_orders(
+                (order_day, from_status, to_status, count, revenue)
+                for order_day, count, revenue in per_day
+            )
+        
+        record_events([
+            _order_event(_TRANSITION_EVENTS[to_status], i, to_status, from_status)
+            for i in ids if i in transitioned
+        ])
+        cache.invalidate_orders(transitioned)
+        
+        rejected_ids = [i for i in ids if i not in transitioned]
+        existing = set()
+        for chunk in _chunks(rejected_ids, BULK_CHUNK_SIZE):
+            existing.update(db.session.scalars(select(Order.id).where(Order.id.in_(chunk))))
+        
+        # Objects already loaded in this session still carry the old status
+        db.session.expire_all()
+        return {
+            'transitioned': [i for i in ids if i in transitioned],
+            'rejected': [
+                {'id': i, 'error': rejection_error if i in existing else "Order not found"}
+                for i in rejected_ids
+            ]
+        }
+    
+    @staticmethod
+    def _restore_stock(order_ids):
+        """Return the stock reserved by the given orders.
+        
+        Quantities are summed per product in the database, then returned
+        with ``_release_stock``.
+        
+        Returns:
+            Dict of product_id to (units, revenue) released
+        """
+        released = defaultdict(lambda: (0, 0.0))
+        for chunk in _chunks(list(order_ids), BULK_CHUNK_SIZE):
+            rows = db.session.execute(
+                select(OrderItem.product_id, func.sum(OrderItem.quantity), func.sum(OrderItem.subtotal))
+                .where(OrderItem.order_id.in_(chunk))
+                .group_by(OrderItem.product_id)
+            )
+            for product_id, quantity, revenue in rows:
+                units, total = released[product_id]
+                released[product_id] = (units + quantity, total + revenue)
+        OrderService._release_stock(released)
+        return dict(released)
+    
+    @staticmethod
+    def _release_stock(released):
+        """Add units back to stock with one executemany UPDATE.
+        
+        Products are updated in id order to keep lock ordering stable, with
+        relative ``stock = stock + n`` updates, so releasing stock never
+        conflicts with concurrent writes to the same products. The units
+        are removed from the sales rollup as well.
+        
+        Args:
+            released: Dict of product_id to (units, revenue)
+        """
+        if not released:
+            return
+        products = Product.__table__
+        threshold = products.c.reorder_threshold
+        default = current_app.config['LOW_STOCK_DEFAULT_THRESHOLD']
+        if default is not None:
+            threshold = func.coalesce(threshold, default)
+        new_stock = products.c.stock + bindparam('quantity')
+        db.session.execute(
+            update(products)
+            .where(products.c.id == bindparam('product_id'))
+            .values(
+                stock=new_stock,
+                # Stock only goes up, so products can only leave the watchlist
+                low_stock_since=case((new_stock >= threshold, None), else_=products.c.low_stock_since),
+                version=products.c.version + 1
+            ),
+            [{'product_id': pid, 'quantity': units} for pid, (units, _) in sorted(released.items())]
+        )
+        rollups.record_product_sales(released, sign=-1)
+        db.session.expire_all()
+
+
+class EventService:
+    """Service for reading and pruning the outbox event log."""
+    
+    @staticmethod
+    def get_events(after=0, limit=100):
+        """Get events with a sequence number greater than ``after``, oldest first."""
+        return db.session.scalars(
+            select(OutboxEvent)
+            .where(OutboxEvent.seq > after)
+            .order_by(OutboxEvent.seq)
+            .limit(limit)
+        ).all()
+    
+    @staticmethod
+    def get_oldest_seq():
+        """Get the sequence number of the oldest retained event, or None."""
+        return db.session.scalar(select(func.min(OutboxEvent.seq)))
+    
+    @staticmethod
+    def get_latest_seq():
+        """Get the sequence number of the newest event, or None."""
+        return db.session.scalar(select(func.max(OutboxEvent.seq)))
+    
+    @staticmethod
+    def prune_events(older_than, batch_size=BULK_CHUNK_SIZE):
+        """Delete events created before ``older_than``.
+        
+        Events are deleted oldest first in batches, each in its own
+        transaction, so pruning never holds the write lock for long.
+        
+        Returns:
+            Number of deleted events
+        """
+        deleted = 0
+        while True:
+            seqs = db.session.scalars(
+                select(OutboxEvent.seq)
+                .where(OutboxEvent.created_at < older_than)
+                .order_by(OutboxEvent.seq)
+                .limit(batch_size)
+            ).all()
+            if not seqs:
+                return deleted
+            db.session.execute(
+                db.delete(OutboxEvent).where(OutboxEvent.seq.in_(seqs)),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()
+            deleted += len(seqs)
+
+
+class ReportService:
+    """Service for sales reports read from the rollup tables."""
+    
+    @staticmethod
+    def get_daily_revenue(date_from=None, date_to=None, status=None):
+        """Get order count and revenue per day and status, oldest day first."""
+        stmt = select(DailyRevenue).where(DailyRevenue.order_count != 0)
+        if date_from is not None:
+            stmt = stmt.where(DailyRevenue.day >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(DailyRevenue.day <= date_to)
+        if status is not None:
+            stmt = stmt.where(DailyRevenue.status == status)
+        return db.session.scalars(stmt.order_by(DailyRevenue.day, DailyRevenue.status)).all()
+    
+    @staticmethod
+    def get_revenue_by_status():
+        """Get total order count and revenue per status."""
+        return db.session.scalars(
+            select(StatusRevenue)
+            .where(StatusRevenue.order_count != 0)
+            .order_by(StatusRevenue.status)
+        ).all()
+    
+    @staticmethod
+    def get_top_products(limit=10):
+        """Get the products with the most units sold."""
+        return db.session.scalars(
+            select(ProductSales)
+            .where(ProductSales.units_sold > 0)
+            .order_by(ProductSales.units_sold.desc(), ProductSales.product_id)
+            .limit(limit)
+        ).all()
+    
+    @staticmethod
+    def rebuild_rollups():
+        """Regenerate all rollup tables from the orders."""
+        rollups.rebuild()
+        db.session.commit()
@@ -0,0 +1,245 @@
+"""Optional horizontal sharding of orders.
+
+With ``ORDER_SHARD_BINDS`` set to a list of ``SQLALCHEMY_BINDS`` keys, the
+``orders`` and ``order_items`` tables live on those databases instead of
+the default one. Products, the outbox and the rollups stay on the default
+(central) database.
+
+- A new order goes to the shard chosen by a stable hash of the customer's
+  email, so all orders of one customer share a shard.
+- Order and item ids are allocated from a counter on that shard and encode
+  it (``id % MAX_SHARDS`` is the shard index). A lookup by id therefore
+  goes straight to one shard, and ids stay unique across shards, which
+  lets orders from several shards share one session.
+- Queries on the sharded tables that do not name a shard run on every
+  shard and their results are concatenated; ``OrderShards.gather`` runs a
+  query on all shards in parallel and merges the ordered results.
+
+A write that touches a shard and the central database (placing or
+cancelling an order moves stock) commits the two transactions one after
+the other. The commits are not atomic across databases: a failure between
+them can leave stock reserved for an order that was not stored.
+
+Shard schemas are created with the central foreign keys in place; SQLite
+does not enforce them across files, other databases need those
+constraints dropped by their migrations.
+"""
+import heapq
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Column, Integer, MetaData, Table, event, inspect, select, update
+
+from app import schema
+
+# Order and item ids are ``counter * MAX_SHARDS + shard index``
+MAX_SHARDS = 1024
+
+SHARDED_TABLES = frozenset(['orders', 'order_items'])
+
+_counters = Table(
+    'order_id_counter', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('next_value', Integer, nullable=False),
+)
+
+
+def shard_of_id(record_id):
+    """Index of the shard that stores the order or item with this id."""
+    return record_id % MAX_SHARDS
+
+
+def _is_sharded(mapper):
+    return mapper is not None and inspect(mapper).local_table.name in SHARDED_TABLES
+
+
+class OrderShards:
+    """The databases holding the sharded tables.
+
+    Must be created inside an application context.
+    """
+
+    def __init__(self, app, db):
+        keys = app.config['ORDER_SHARD_BINDS']
+        if len(keys) > MAX_SHARDS:
+            raise ValueError(f"At most {MAX_SHARDS} order shards are supported")
+        self.app = app
+        self.db = db
+        self.engines = [db.engines[key] for key in keys]
+        # Enough workers for a few concurrent scatter-gather queries
+        self.executor = ThreadPoolExecutor(
+            max_workers=4 * len(self.engines), thread_name_prefix='order-shard'
+        )
+        app.extensions['order_shards'] = self
+
+        from app.models import Order, OrderItem
+        for engine in self.engines:
+            db.metadata.create_all(engine, tables=[Order.__table__, OrderItem.__table__])
+            for change in schema.upgrade(engine, db.metadata):
+                app.logger.info('Schema upgrade of %s: added %s', engine.url, change)
+            _counters.create(engine, checkfirst=True)
+            with engine.begin() as connection:
+                if connection.scalar(select(_counters.c.id)) is None:
+                    connection.execute(_counters.insert().values(id=1, next_value=1))
+
+    def __len__(self):
+        return len(self.engines)
+
+    def shard_for_email(self, email):
+        """Index of the shard that receives new orders of this customer."""
+        return zlib.crc32(email.strip().lower().encode()) % len(self.engines)
+
+    def allocate_ids(self, session, shard, count):
+        """Reserve ``count`` consecutive ids on a shard, in the session's transaction."""
+        connection = session.connection(bind_arguments={'shard_id': shard})
+        stmt = update(_counters).values(next_value=_counters.c.next_value + count)
+        if connection.dialect.update_returning:
+            end = connection.scalar(stmt.returning(_counters.c.next_value))
+        else:
+            connection.execute(stmt)
+            end = connection.scalar(select(_counters.c.next_value))
+        return [value * MAX_SHARDS + shard for value in range(end - count, end)]
+
+    def gather(self, statement, params=None, key=None):
+        """Run an ORM query on every shard in parallel and merge the results.
+
+        Each shard runs in its own application context and session, so the
+        returned objects are detached: the query must eager-load everything
+        the caller reads from them.
+
+        Args:
+            statement: Select of a sharded entity
+            key: Sort key of the merged results; each shard's query must
+                already be ordered by it. Without it, results are concatenated
+                in shard order.
+        """
+        def run(shard):
+            with self.app.app_context():
+                return self.db.session.scalars(
+                    statement, params, bind_arguments={'shard_id': shard}
+                ).all()
+
+        parts = list(self.executor.map(run, range(len(self.engines))))
+        if key is None:
+            return [row for part in parts for row in part]
+        return list(heapq.merge(*parts, key=key))
+
+
+def get_shards():
+    """The ``OrderShards`` of the current application, or None when not sharded."""
+    return current_app.extensions.get('order_shards')
+
+
+class RoutingSession(Session):
+    """Session that sends statements on the sharded tables to their shard.
+
+    Without order shards configured it behaves like the Flask-SQLAlchemy
+    session it extends.
+    """
+
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self.order_shards = current_app.extensions.get('order_shards')
+        if self.order_shards is not None:
+            self.connection_callable = self._connection_for_instance
+
+    def get_bind(self, mapper=None, clause=None, bind=None, shard_id=None, **kwargs):
+        shards = self.order_shards
+        if shards is not None and bind is None and (shard_id is not None or _is_sharded(mapper)):
+            # Without a shard (dialect checks), any shard will do
+            return shards.engines[shard_id or 0]
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+    def get(self, entity, ident, **kwargs):
+        shards = self.order_shards
+        if shards is not None and isinstance(ident, int) and _is_sharded(entity):
+            shard = shard_of_id(ident)
+            if shard >= len(shards):
+                return None
+            kwargs.setdefault('bind_arguments', {'shard_id': shard})
+        return super().get(entity, ident, **kwargs)
+
+    def _connection_for_instance(self, mapper, instance):
+        """Connection a flush uses to write ``instance``."""
+        if _is_sharded(mapper):
+            return self.connection(bind_arguments={'shard_id': shard_of_id(instance.id)})
+        return self.connection(bind_arguments={'mapper': mapper})
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _assign_ids(session, flush_context, instances):
+    """Give new orders and items ids on their shard before they are inserted."""
+    shards = session.order_shards
+    if shards is None:
+        return
+    from app.models import Order, OrderItem
+
+    new_orders = [o for o in session.new if isinstance(o, Order) and o.id is None]
+    # Items of new orders in their order, so ids follow the order's item list
+    new_items = [i for o in new_orders for i in o.items if i.id is None]
+    new_items += [
+        i for i in session.new
+        if isinstance(i, OrderItem) and i.id is None and i.order not in new_orders
+    ]
+    if not new_orders and not new_items:
+        return
+
+    def order_shard(order):
+        if order.id is not None:
+            return shard_of_id(order.id)
+        return shards.shard_for_email(order.customer_email)
+
+    pending = defaultdict(list)
+    for order in new_orders:
+        pending[order_shard(order)].append(order)
+    for item in new_items:
+        shard = order_shard(item.order) if item.order is not None else shard_of_id(item.order_id)
+        pending[shard].append(item)
+    for shard, records in pending.items():
+        for record, record_id in zip(records, shards.allocate_ids(session, shard, len(records))):
+            record.id = record_id
+
+
+def _inherited_shard(orm_execute_state):
+    """Shard implied by the object or query that triggered a relationship load."""
+    top = orm_execute_state.execution_options.get('sa_top_level_orm_context')
+    if top is not None and top.bind_arguments.get('shard_id') is not None:
+        return top.bind_arguments['shard_id']
+    if not orm_execute_state.is_select:
+        return None
+    for state in (orm_execute_state.lazy_loaded_from, orm_execute_state.load_options._refresh_state):
+        if state is not None and _is_sharded(state.mapper) and state.identity:
+            return shard_of_id(state.identity[0])
+    return None
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _route(orm_execute_state):
+    """Run ORM statements on the sharded tables on their shard, or on all shards."""
+    shards = orm_execute_state.session.order_shards
+    if (
+        shards is None
+        or orm_execute_state.bind_arguments.get('shard_id') is not None
+        or not _is_sharded(orm_execute_state.bind_mapper)
+    ):
+        return None
+
+    shard = _inherited_shard(orm_execute_state)
+    targets = range(len(shards)) if shard is None else [shard]
+    results = [
+        orm_execute_state.invoke_statement(
+            bind_arguments={**orm_execute_state.bind_arguments, 'shard_id': target}
+        )
+        for target in targets
+    ]
+    return results[0].merge(*results[1:]) if len(results) > 1 else results[0]
+
+
+def init_app(app, db):
+    """Set up order shards when ``ORDER_SHARD_BINDS`` is configured."""
+    if app.config['ORDER_SHARD_BINDS']:
+        with app.app_context():
+            OrderShards(app, db)
@@ -0,0 +1,138 @@
+"""
+Benchmark: ad-hoc analytics over all orders - ORM vs SQL vs columnar snapshot.
+
+Fills a file-backed SQLite database with orders (random status and day, a
+few items each) and answers two questions three ways:
+
+- revenue per status and units sold per product (without cancelled orders),
+- by iterating ORM objects (``OrderService.iter_all_orders``),
+- by GROUP BY queries on ``orders`` and ``order_items``,
+- by vectorized NumPy operations over a memory-mapped snapshot
+  (``app.analytics``), opened fresh for every run.
+
+The time to write the snapshot is reported separately.
+
+Usage:
+    python -m benchmarks.bench_analytics [--orders 200000] [--repeat 3]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app import create_app
+from app.analytics import OrderSnapshot, write_snapshot
+from app.models import db, Product, Order, OrderItem
+from app.services import OrderService
+
+
+def fill(count, products=500, batch_size=20_000):
+    db.session.execute(Product.__table__.insert(), [
+        {'name': f'Produkt {i}', 'price': 10.0 + i, 'stock': 1000} for i in range(products)
+    ])
+    rng = random.Random(42)
+    start_day = datetime(2024, 1, 1)
+    item_id = 0
+    for start in range(0, count, batch_size):
+        orders, items = [], []
+        for order_id in range(start + 1, min(start + batch_size, count) + 1):
+            lines = []
+            for _ in range(rng.randint(1, 5)):
+                item_id += 1
+                quantity = rng.randint(1, 4)
+                price = 10.0 + rng.randrange(products)
+                lines.append({'id': item_id, 'order_id': order_id, 'product_id': int(price - 9),
+                              'quantity': quantity, 'unit_price': price, 'subtotal': price * quantity})
+            items += lines
+            orders.append({
+                'id': order_id, 'customer_name': f'Klient {order_id}',
+                'customer_email': f'klient{order_id}@example.com',
+                'status': rng.choice(Order.VALID_STATUSES),
+                'total_amount': sum(line['subtotal'] for line in lines),
+                'created_at': start_day + timedelta(minutes=rng.randrange(365 * 24 * 60)),
+            })
+        db.session.execute(Order.__table__.insert(), orders)
+        db.session.execute(OrderItem.__table__.insert(), items)
+        db.session.commit()
+
+
+def with_orm():
+    revenue = defaultdict(float)
+    units = defaultdict(int)
+    for order in OrderService.iter_all_orders():
+        revenue[order.status] += order.total_amount
+        if order.status != Order.STATUS_CANCELLED:
+            for item in order.items:
+                units[item.product_id] += item.quantity
+    return revenue, units
+
+
+def with_sql():
+    revenue = dict(db.session.execute(
+        select(Order.status, func.sum(Order.total_amount)).group_by(Order.status)
+    ).all())
+    units = dict(db.session.execute(
+        select(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .join(Order, OrderItem.order_id == Order.id)
+        .where(Order.status != Order.STATUS_CANCELLED)
+        .group_by(OrderItem.product_id)
+    ).all())
+    return revenue, units
+
+
+def with_snapshot(path):
+    snapshot = OrderSnapshot(path)
+    revenue = {row['status']: row['revenue'] for row in snapshot.revenue_by_status()}
+    sold = [s for s in snapshot.statuses if s != Order.STATUS_CANCELLED]
+    product_ids, units, _ = snapshot.product_totals(sold)
+    return revenue, dict(zip(product_ids.tolist(), units.tolist()))
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.remove()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app('testing', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        })
+        with app.app_context():
+            fill(args.orders)
+            path = os.path.join(tmp, 'snapshot')
+            start = time.perf_counter()
+            counts = write_snapshot(path)
+            print(f"snapshot of {counts['orders']} orders / {counts['items']} items: "
+                  f'{time.perf_counter() - start:.2f} s')
+
+            results = {}
+            for label, fn in [('ORM objects', with_orm), ('SQL GROUP BY', with_sql),
+                              ('NumPy snapshot', lambda: with_snapshot(path))]:
+                elapsed, results[label] = best_of(fn, args.repeat)
+                print(f'{label:>16}: {elapsed * 1000:9.1f} ms')
+
+            revenue, units = results['SQL GROUP BY']
+            for label, (other_revenue, other_units) in results.items():
+                assert other_units == units, label
+                assert all(abs(other_revenue[s] - revenue[s]) < 0.01 for s in revenue), label
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: a point-of-sale call sequence as separate requests vs POST /api/batch.
+
+Runs the sequence create product, adjust stock, place order, confirm order
+against a file-backed SQLite database three ways: four separate requests,
+one batch and one atomic batch. The server time per sequence is measured
+through the Flask test client; the network is simulated by adding one
+round-trip time (RTT) per HTTP request, for each ``--rtt`` value.
+
+Usage:
+    python -m benchmarks.bench_batch [--sequences 200] [--rtt 1 20 80 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app import create_app
+from app.models import db
+
+OPERATIONS = [
+    {'method': 'POST', 'path': '/api/products', 'body': {'name': 'Kawa', 'price': 45.0, 'stock': 0}},
+    {'method': 'PATCH', 'path': '/api/products/$0.id/stock', 'body': {'quantity_change': 10}},
+    {'method': 'POST', 'path': '/api/orders',
+     'body': {'customer_name': 'Kasa 1', 'customer_email': 'kasa1@example.com',
+              'items': [{'product_id': '$0.id', 'quantity': 2}]}},
+    {'method': 'POST', 'path': '/api/orders/$2.id/confirm'},
+]
+
+
+def separate(client):
+    product_id = client.post('/api/products', json=OPERATIONS[0]['body']).get_json()['id']
+    client.patch(f'/api/products/{product_id}/stock', json=OPERATIONS[1]['body'])
+    body = dict(OPERATIONS[2]['body'], items=[{'product_id': product_id, 'quantity': 2}])
+    order_id = client.post('/api/orders', json=body).get_json()['id']
+    response = client.post(f'/api/orders/{order_id}/confirm')
+    assert response.status_code == 200, response.get_json()
+
+
+def batched(client, atomic):
+    response = client.post('/api/batch', json={'operations': OPERATIONS, 'atomic': atomic})
+    assert response.status_code == 200, response.get_json()
+
+
+def run(label, fn, args, tmp):
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, f'{label}.db')}"
+    })
+    client = app.test_client()
+    fn(client)
+    start = time.perf_counter()
+    for _ in range(args.sequences):
+        fn(client)
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        db.engine.dispose()
+    return elapsed / args.sequences * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sequences', type=int, default=200)
+    parser.add_argument('--rtt', type=float, nargs='+', default=[1, 20, 80, 200],
+                        help='simulated round-trip times in ms')
+    args = parser.parse_args()
+
+    modes = [
+        ('separate', separate, len(OPERATIONS)),
+        ('batch', lambda client: batched(client, False), 1),
+        ('atomic', lambda client: batched(client, True), 1),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        server = {label: run(label, fn, args, tmp) for label, fn, _ in modes}
+
+    print('ms per sequence (server time + requests x RTT)')
+    print(f"{'':>10} {'requests':>9} {'server':>8}" + ''.join(f'{f"RTT {rtt:g}":>10}' for rtt in args.rtt))
+    for label, _, round_trips in modes:
+        totals = ''.join(f'{server[label] + round_trips * rtt:10.1f}' for rtt in args.rtt)
+        print(f'{label:>10} {round_trips:>9} {server[label]:8.1f}{totals}')
+
+
+if __name__ == '__main__':
+    main()
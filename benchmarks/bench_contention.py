@@ -0,0 +1,84 @@
+"""
+Benchmark: conflict rate of concurrent writes to the same products.
+
+Worker threads adjust the stock of a few hot products through the API
+(``PATCH /api/products/{id}/stock``) as fast as they can. Every write is
+version-checked, so a write that read a row another writer has since
+changed is retried (up to ``OPTIMISTIC_LOCK_RETRIES``) or answered with
+``409``. The benchmark reports throughput, the share of ``409`` responses
+and whether the final stock adds up (no lost updates), once per retry
+setting.
+
+Usage:
+    python -m benchmarks.bench_contention [--threads 8] [--writes 200] [--products 2]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from app import create_app
+from app.models import db, Product
+
+
+def run(retries, threads, writes, products, tmp):
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, f'bench{retries}.db')}",
+        'OPTIMISTIC_LOCK_RETRIES': retries,
+    })
+    with app.app_context():
+        db.session.add_all([Product(name=f'Produkt {i}', price=10.0, stock=0) for i in range(products)])
+        db.session.commit()
+        product_ids = [p.id for p in db.session.scalars(db.select(Product))]
+
+    statuses = Counter()
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        client = app.test_client()
+        seen = Counter()
+        barrier.wait()
+        for i in range(writes):
+            response = client.patch(f'/api/products/{product_ids[(index + i) % products]}/stock',
+                                    json={'quantity_change': 1})
+            seen[response.status_code] += 1
+        with lock:
+            statuses.update(seen)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        stock = db.session.scalar(db.select(db.func.sum(Product.stock)))
+        db.engine.dispose()
+    return statuses, elapsed, stock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=200, help='writes per thread')
+    parser.add_argument('--products', type=int, default=2, help='number of hot products')
+    args = parser.parse_args()
+
+    total = args.threads * args.writes
+    print(f'{args.threads} threads x {args.writes} writes on {args.products} products')
+    with tempfile.TemporaryDirectory() as tmp:
+        for retries in (0, 1, 3):
+            statuses, elapsed, stock = run(retries, args.threads, args.writes, args.products, tmp)
+            ok = statuses[200]
+            print(f'retries={retries}: {ok / elapsed:7.0f} writes/s, '
+                  f'409: {statuses[409] / total:6.1%}, other errors: {total - ok - statuses[409]}, '
+                  f'lost updates: {ok - stock}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: write throughput and latency with and without group commit.
+
+Runs concurrent stock updates against a file-backed SQLite database (so
+every commit pays a real fsync) and reports requests per second together
+with p50/p99 latency.
+
+Usage:
+    python -m benchmarks.bench_group_commit [--threads 16] [--requests 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from app import create_app
+from app.models import db
+
+
+def run(group_commit, threads, requests_per_thread, window_ms, max_batch):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app('testing', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'GROUP_COMMIT_ENABLED': group_commit,
+            'GROUP_COMMIT_WINDOW_MS': window_ms,
+            'GROUP_COMMIT_MAX_BATCH': max_batch,
+        })
+        client = app.test_client()
+        product_id = client.post('/api/products',
+            data=json.dumps({'name': 'Bench', 'price': 1.0, 'stock': 0}),
+            content_type='application/json'
+        ).get_json()['id']
+        
+        latencies = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+        
+        def worker():
+            local_client = app.test_client()
+            local = []
+            barrier.wait()
+            for _ in range(requests_per_thread):
+                start = time.perf_counter()
+                response = local_client.patch(f'/api/products/{product_id}/stock',
+                    data=json.dumps({'quantity_change': 1}),
+                    content_type='application/json'
+                )
+                local.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.get_json()
+            with lock:
+                latencies.extend(local)
+        
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        
+        committer = app.extensions.get('group_commit')
+        batches = None
+        if committer is not None:
+            committer.stop()
+            batches = committer.stats['batches']
+        with app.app_context():
+            db.engine.dispose()
+    
+    latencies.sort()
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        'batches': batches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help='requests per thread')
+    parser.add_argument('--window-ms', type=float, default=2.0)
+    parser.add_argument('--max-batch', type=int, default=64)
+    args = parser.parse_args()
+    
+    for group_commit in (False, True):
+        result = run(group_commit, args.threads, args.requests, args.window_ms, args.max_batch)
+        label = 'group commit' if group_commit else 'commit per request'
+        batches = f", {result['batches']} batches" if result['batches'] else ''
+        print(f"{label:>20}: {result['throughput']:8.1f} req/s, "
+              f"p50 {result['p50_ms']:6.2f} ms, p99 {result['p99_ms']:6.2f} ms{batches}")
+
+
+if __name__ == '__main__':
+    main()
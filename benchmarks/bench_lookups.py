@@ -0,0 +1,87 @@
+"""
+Benchmark: Python overhead of the hot-path lookups.
+
+Compares the legacy Query API lookups with the 2.0-style statements used by
+the services (``session.get``, prebuilt statements with bound parameters,
+one prefetch query for the products of a new order). The database is a small in-memory SQLite
+one, so the timings are dominated by building, compiling and loading in
+Python rather than by the database itself.
+
+Usage:
+    python -m benchmarks.bench_lookups [--calls 5000] [--items 10]
+"""
+import argparse
+import time
+import warnings
+
+from sqlalchemy.exc import LegacyAPIWarning
+
+from app import create_app
+from app.models import db, Product, Order, OrderItem
+from app.services import WITH_ITEMS, _PRODUCTS_BY_ID, OrderService
+
+
+def seed(products=50, orders=200):
+    catalog = [Product(name=f'Produkt {i}', price=10.0, stock=1000) for i in range(products)]
+    db.session.add_all(catalog)
+    for i in range(orders):
+        order = Order(customer_name='Klient', customer_email='klient@example.com',
+                      status=Order.STATUS_COMPLETED if i % 20 else Order.STATUS_PENDING)
+        order.items.append(OrderItem(product=catalog[i % products], quantity=1,
+                                     unit_price=10.0, subtotal=10.0))
+        db.session.add(order)
+    db.session.commit()
+    return [p.id for p in catalog]
+
+
+def per_call(fn, calls):
+    """Microseconds per call of ``fn``, with an empty identity map each time."""
+    session = db.session
+    for _ in range(min(calls, 200)):
+        fn()
+        session.expunge_all()
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+        session.expunge_all()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=5000)
+    parser.add_argument('--items', type=int, default=10, help='products per simulated order')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', LegacyAPIWarning)
+
+    app = create_app('testing')
+    with app.app_context():
+        product_ids = seed()
+        items = product_ids[:args.items]
+        session = db.session
+
+        def prefetch_then_get():
+            products = session.scalars(_PRODUCTS_BY_ID, {'ids': items}).all()
+            for product_id in items:
+                session.get(Product, product_id)
+            return products
+
+        cases = [
+            ('product by id', lambda: Product.query.get(items[0]),
+             lambda: session.get(Product, items[0])),
+            ('order by id with items', lambda: Order.query.options(WITH_ITEMS).get(1),
+             lambda: OrderService.get_order(1)),
+            ('orders by status', lambda: Order.query.options(WITH_ITEMS).filter_by(status='pending').all(),
+             lambda: OrderService.get_orders_by_status('pending')),
+            (f'{args.items} order products', lambda: [Product.query.get(i) for i in items],
+             prefetch_then_get),
+        ]
+        print(f'{"lookup":>24} {"legacy":>12} {"2.0 style":>12}')
+        for label, legacy, current in cases:
+            before = per_call(legacy, args.calls)
+            after = per_call(current, args.calls)
+            print(f'{label:>24} {before:9.1f} us {after:9.1f} us  ({before / after:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: peak memory of full-table order reads.
+
+Fills a file-backed SQLite database with orders of three items each, then
+serializes every order once through ``OrderService.get_all_orders`` (one
+materialized list) and once through ``OrderService.iter_all_orders``
+(batches streamed with ``yield_per``), and reports the tracemalloc peak
+and the wall time of each.
+
+Usage:
+    python -m benchmarks.bench_memory [--orders 200000] [--batch-size 1000]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from app import create_app
+from app.models import db, Product, Order, OrderItem
+from app.services import OrderService
+
+
+def fill(count, products=100, batch_size=20_000):
+    db.session.execute(Product.__table__.insert(), [
+        {'name': f'Produkt {i}', 'price': 10.0 + i, 'stock': 1000} for i in range(products)
+    ])
+    rng = random.Random(42)
+    for start in range(0, count, batch_size):
+        ids = range(start + 1, min(start + batch_size, count) + 1)
+        db.session.execute(Order.__table__.insert(), [
+            {'id': i, 'customer_name': f'Klient {i}', 'customer_email': f'klient{i}@example.com',
+             'status': Order.STATUS_COMPLETED, 'total_amount': 30.0}
+            for i in ids
+        ])
+        db.session.execute(OrderItem.__table__.insert(), [
+            {'order_id': i, 'product_id': rng.randint(1, products), 'quantity': 1,
+             'unit_price': 10.0, 'subtotal': 10.0}
+            for i in ids for _ in range(3)
+        ])
+        db.session.commit()
+
+
+def measure(orders):
+    """Serialize every order; return (peak MiB, seconds, orders)."""
+    db.session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = 0
+    for order in orders():
+        json.dumps(order.to_dict())
+        count += 1
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.remove()
+    return peak / 2**20, elapsed, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=200_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app('testing', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        })
+        with app.app_context():
+            fill(args.orders)
+            cases = [
+                ('get_all_orders', OrderService.get_all_orders),
+                ('iter_all_orders', lambda: OrderService.iter_all_orders(args.batch_size)),
+            ]
+            for label, orders in cases:
+                peak, elapsed, count = measure(orders)
+                print(f'{label:>16}: {count} orders, peak {peak:8.1f} MiB, {elapsed:6.1f} s')
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
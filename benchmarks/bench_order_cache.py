@@ -0,0 +1,74 @@
+"""
+Benchmark: GET /api/orders/<id> with and without the response cache.
+
+Places orders with several items, completes them, then requests random
+orders through the Flask test client, once with ``ORDER_CACHE_ENABLED``
+off and once on (after a warm-up pass that fills the cache). Reports the
+mean latency per request.
+
+Usage:
+    python -m benchmarks.bench_order_cache [--orders 500] [--items 5] [--requests 5000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app import create_app
+from app.models import db, Product, Order, OrderItem
+
+
+def seed(orders, items):
+    catalog = [Product(name=f'Produkt {i}', price=10.0 + i, stock=10_000) for i in range(50)]
+    db.session.add_all(catalog)
+    rng = random.Random(7)
+    for _ in range(orders):
+        order = Order(customer_name='Klient', customer_email='klient@example.com',
+                      status=Order.STATUS_COMPLETED)
+        for product in rng.sample(catalog, items):
+            order.items.append(OrderItem(product=product, quantity=1,
+                                         unit_price=product.price, subtotal=product.price))
+        order.calculate_total()
+        db.session.add(order)
+    db.session.commit()
+    return [o.id for o in db.session.scalars(db.select(Order))]
+
+
+def run(enabled, args, tmp):
+    app = create_app('testing', {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, f'bench{int(enabled)}.db')}",
+        'ORDER_CACHE_ENABLED': enabled,
+    })
+    with app.app_context():
+        order_ids = seed(args.orders, args.items)
+    client = app.test_client()
+    rng = random.Random(1)
+    for order_id in order_ids:
+        client.get(f'/api/orders/{order_id}')
+    picks = [rng.choice(order_ids) for _ in range(args.requests)]
+    start = time.perf_counter()
+    for order_id in picks:
+        client.get(f'/api/orders/{order_id}')
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        db.engine.dispose()
+    return elapsed / args.requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--items', type=int, default=5, help='items per order')
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uncached = run(False, args, tmp)
+        cached = run(True, args, tmp)
+    print(f'without cache: {uncached:8.1f} us/request')
+    print(f'   with cache: {cached:8.1f} us/request  ({uncached / cached:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: product search latency on a large catalog.
+
+Fills a file-backed SQLite database with generated product names, then
+measures p50/p99 latency of prefix searches through the FTS5 index and
+through the LIKE fallback.
+
+Usage:
+    python -m benchmarks.bench_search [--products 1000000] [--queries 500]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app import create_app
+from app.models import db, Product
+from app.search import search_products
+
+WORDS = [
+    'laptop', 'mysz', 'klawiatura', 'monitor', 'kabel', 'ladowarka', 'sluchawki',
+    'glosnik', 'kamera', 'dysk', 'pendrive', 'router', 'drukarka', 'tablet',
+    'telefon', 'etui', 'podkladka', 'zasilacz', 'adapter', 'mikrofon',
+    'pro', 'mini', 'max', 'ultra', 'slim', 'gaming', 'biurowy', 'czarny', 'bialy',
+]
+
+
+def fill(count, batch_size=50_000):
+    rng = random.Random(42)
+    table = Product.__table__
+    for start in range(0, count, batch_size):
+        rows = [
+            {'name': f"{' '.join(rng.sample(WORDS, 3))} {start + i}", 'price': 10.0, 'stock': 1}
+            for i in range(min(batch_size, count - start))
+        ]
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+
+
+def measure(queries, fts5):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search_products(query, 21, 0, fts5)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+    
+    rng = random.Random(7)
+    queries = [
+        ' '.join(word[:rng.randint(2, len(word))] for word in rng.sample(WORDS, rng.randint(1, 2)))
+        for _ in range(args.queries)
+    ]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app('testing', {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        })
+        with app.app_context():
+            start = time.perf_counter()
+            fill(args.products)
+            print(f'Indexed {args.products} products in {time.perf_counter() - start:.1f} s')
+            
+            for label, fts5 in (('FTS5 prefix', True), ('LIKE prefix', False)):
+                if fts5 and not app.extensions['product_search_fts5']:
+                    print(f'{label:>12}: FTS5 not available')
+                    continue
+                p50, p99 = measure(queries, fts5)
+                print(f'{label:>12}: p50 {p50:7.2f} ms, p99 {p99:7.2f} ms')
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
 """Pytest configuration and fixtures."""
+import json
+import random
+
 import pytest
+from sqlalchemy import event
 from app import create_app
-from app.models import db, Product, Order
+from app.models import db, Product, Order, OrderItem
 
 
 @pytest.fixture
@@ -10,13 +14,48 @@ def app():
     app = create_app('testing')
     
     with app.app_context():
-        db.create_all()
+        db.create_all(bind_key=None)
         yield app
         db.session.remove()
-        db.drop_all()
+        db.drop_all(bind_key=None)
         db.engine.dispose()  # Zamyka wszystkie połączenia z bazą
 
 
+@pytest.fixture
+def make_app(tmp_path):
+    """Factory for applications backed by a temporary SQLite file.
+    
+    Tests running requests from several threads need this: the in-memory
+    database shares one connection between all threads.
+    """
+    apps = []
+    
+    def factory(**overrides):
+        settings = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / f'test{len(apps)}.db'}"}
+        settings.update(overrides)
+        app = create_app('testing', settings)
+        apps.append(app)
+        return app
+    
+    yield factory
+    for app in apps:
+        committer = app.extensions.get('group_commit')
+        if committer is not None:
+            committer.stop()
+        response_cache = app.extensions.get('order_response_cache')
+        if response_cache is not None:
+            response_cache.close()
+        sweeper = app.extensions.get('reservation_sweeper')
+        if sweeper is not None:
+            sweeper.stop()
+        shards = app.extensions.get('order_shards')
+        if shards is not None:
+            shards.executor.shutdown()
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
 @pytest.fixture
 def client(app):
     """Create test client."""
@@ -69,3 +108,117 @@ def sample_order(app, sample_product):
         db.session.add(order)
         db.session.commit()
         return order.id
+
+
+@pytest.fixture
+def place_order():
+    """Place orders through the API.
+    
+    ``place_order(client, {product_id: quantity})`` returns the id of the
+    new order. Orders are sharded by e-mail, so tests spreading orders over
+    shards pass their own ``customer_email``.
+    """
+    def place(client, items, customer_name='Jan Kowalski', customer_email='jan@example.com'):
+        response = client.post('/api/orders',
+            data=json.dumps({
+                'customer_name': customer_name,
+                'customer_email': customer_email,
+                'items': [{'product_id': p, 'quantity': q} for p, q in items.items()]
+            }),
+            content_type='application/json'
+        )
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['id']
+    
+    return place
+
+
+class QueryRecorder:
+    """Captures the SQL statements sent to the database.
+    
+    ``plans()`` runs EXPLAIN QUERY PLAN for every captured statement against
+    the same (SQLite) database, with the parameters it was executed with.
+    """
+    
+    EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+    
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(self.EXPLAINABLE):
+            # executemany passes a list of parameter sets (but insertmanyvalues
+            # batches arrive as one flat tuple); plan the first set
+            if executemany and isinstance(parameters, list):
+                parameters = parameters[0]
+            self.statements.append((statement, parameters))
+    
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+    
+    def plans(self):
+        """List of (statement, plan details) for the captured statements."""
+        result = []
+        with self.engine.connect() as connection:
+            for statement, parameters in self.statements:
+                rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+                result.append((statement, [row[3] for row in rows]))
+        return result
+    
+    def full_scans(self, tables):
+        """(statement, plan detail) pairs that scan one of ``tables`` in full."""
+        scans = []
+        for statement, details in self.plans():
+            for detail in details:
+                # "SEARCH t USING INDEX" is a lookup; any "SCAN t ..." reads the whole
+                # table or one of its indexes from start to end
+                words = detail.split()
+                if len(words) > 1 and words[0] == 'SCAN' and words[1] in tables:
+                    scans.append((statement, detail))
+        return scans
+
+
+@pytest.fixture
+def query_recorder(app):
+    """Recorder of the statements issued inside its ``with`` block."""
+    return QueryRecorder(db.engine)
+
+
+@pytest.fixture
+def seeded_db(app):
+    """Database with enough products, orders and items for realistic query plans."""
+    rng = random.Random(1)
+    with app.app_context():
+        products = [Product(name=f'Produkt {i}', price=10.0 + i, stock=1000) for i in range(50)]
+        db.session.add_all(products)
+        db.session.flush()
+        for i in range(400):
+            order = Order(
+                customer_name=f'Klient {i}',
+                customer_email=f'klient{i}@example.com',
+                status=rng.choice(Order.VALID_STATUSES)
+            )
+            for product in rng.sample(products, 3):
+                order.items.append(OrderItem(
+                    product=product, quantity=1, unit_price=product.price, subtotal=product.price
+                ))
+            order.calculate_total()
+            db.session.add(order)
+        db.session.commit()
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        return {
+            'product_ids': [p.id for p in products],
+            'orders_by_status': {
+                status: db.session.scalars(
+                    db.select(Order.id).where(Order.status == status)
+                ).all()
+                for status in Order.VALID_STATUSES
+            }
+        }
@@ -6,6 +6,8 @@ i bazą danych. Wykrywają problemy z integracją komponentów.
 """
 import pytest
 import json
+import threading
+import time
 
 
 class TestProductAPI:
@@ -181,3 +183,1374 @@ class TestOrderAPI:
         # Sprawdź że stock wrócił
         final_stock = client.get(f'/api/products/{sample_product}').get_json()['stock']
         assert final_stock == initial_stock
+
+
+class TestBulkOrderAPI:
+    """Testy integracyjne masowych zmian statusów zamówień."""
+    
+    def test_bulk_confirm_reports_transitioned_and_rejected(self, client, sample_product, place_order):
+        """
+        TEST 21: Masowe potwierdzanie zwraca listę przetworzonych i odrzuconych zamówień.
+        
+        UZASADNIENIE BIZNESOWE:
+        Dział realizacji potwierdza zamówienia falami po kilka tysięcy.
+        Zamówienia w złym statusie lub nieistniejące nie mogą blokować całej fali,
+        ale muszą zostać jasno zgłoszone.
+        """
+        first = place_order(client, {sample_product: 1})
+        second = place_order(client, {sample_product: 1})
+        client.post(f'/api/orders/{second}/cancel')
+        
+        response = client.post('/api/orders/bulk/confirm',
+            data=json.dumps({'order_ids': [first, second, 99999]}),
+            content_type='application/json'
+        )
+        
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['transitioned'] == [first]
+        assert data['rejected'] == [
+            {'id': second, 'error': 'Only pending orders can be confirmed'},
+            {'id': 99999, 'error': 'Order not found'},
+        ]
+        assert client.get(f'/api/orders/{first}').get_json()['status'] == 'confirmed'
+    
+    def test_bulk_cancel_restores_stock(self, client, sample_product, place_order):
+        """
+        TEST 22: Masowe anulowanie przywraca stan magazynowy wszystkich zamówień.
+        
+        UZASADNIENIE BIZNESOWE:
+        Anulowanie wielu zamówień naraz musi zwrócić na stan dokładnie tyle
+        sztuk, ile zarezerwowały - niezależnie od liczby zamówień na ten sam produkt.
+        """
+        first = place_order(client, {sample_product: 2})
+        second = place_order(client, {sample_product: 3})
+        assert client.get(f'/api/products/{sample_product}').get_json()['stock'] == 5
+        
+        response = client.post('/api/orders/bulk/cancel',
+            data=json.dumps({'order_ids': [first, second]}),
+            content_type='application/json'
+        )
+        
+        assert response.status_code == 200
+        assert response.get_json()['transitioned'] == [first, second]
+        assert client.get(f'/api/products/{sample_product}').get_json()['stock'] == 10
+        assert client.get(f'/api/orders/{second}').get_json()['status'] == 'cancelled'
+    
+    def test_bulk_transition_requires_order_ids(self, client):
+        """
+        TEST 23: Masowa zmiana statusu wymaga listy identyfikatorów.
+        
+        UZASADNIENIE BIZNESOWE:
+        Błędne żądanie (brak lub pusta lista) ma zostać odrzucone czytelnym błędem
+        zamiast po cichu nic nie zmieniać.
+        """
+        missing = client.post('/api/orders/bulk/complete',
+            data=json.dumps({'ids': [1]}),
+            content_type='application/json'
+        )
+        empty = client.post('/api/orders/bulk/complete',
+            data=json.dumps({'order_ids': []}),
+            content_type='application/json'
+        )
+        
+        assert missing.status_code == 400
+        assert empty.status_code == 400
+
+
+class TestGroupCommit:
+    """Testy integracyjne trybu group commit (wspólny commit równoległych zapisów)."""
+    
+    def test_concurrent_writes_share_commits(self, make_app):
+        """
+        TEST 24: Równoległe zamówienia są zatwierdzane wspólnie, każde z własnym wynikiem.
+        
+        UZASADNIENIE BIZNESOWE:
+        Przy dużym ruchu każdy osobny commit to osobny fsync na dysku.
+        Grupowanie zapisów zwiększa przepustowość, ale poprawne zamówienia muszą
+        przejść, a błędne (brak towaru) zostać odrzucone niezależnie od sąsiadów.
+        """
+        group_app = make_app(GROUP_COMMIT_ENABLED=True, GROUP_COMMIT_WINDOW_MS=50)
+        client = group_app.test_client()
+        product_id = client.post('/api/products',
+            data=json.dumps({'name': 'Kubek', 'price': 10.0, 'stock': 5}),
+            content_type='application/json'
+        ).get_json()['id']
+        
+        quantities = [1, 1, 1, 1, 50]  # ostatnie zamówienie przekracza stan
+        barrier = threading.Barrier(len(quantities))
+        statuses = [None] * len(quantities)
+        
+        def place_order(index, quantity):
+            barrier.wait()
+            response = group_app.test_client().post('/api/orders',
+                data=json.dumps({
+                    'customer_name': 'Test',
+                    'customer_email': 'test@test.com',
+                    'items': [{'product_id': product_id, 'quantity': quantity}]
+                }),
+                content_type='application/json'
+            )
+            statuses[index] = response.status_code
+        
+        threads = [threading.Thread(target=place_order, args=(i, q))
+                   for i, q in enumerate(quantities)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert statuses == [201, 201, 201, 201, 400]
+        assert client.get(f'/api/products/{product_id}').get_json()['stock'] == 1
+        stats = group_app.extensions['group_commit'].stats
+        assert stats['jobs'] == len(quantities) + 1
+        assert stats['batches'] < stats['jobs']
+
+
+class TestEventFeedAPI:
+    """Testy integracyjne strumienia zdarzeń (transactional outbox)."""
+    
+    def test_events_follow_order_lifecycle_and_resume(self, client, sample_product, place_order):
+        """
+        TEST 25: Każda zmiana zamówienia trafia do dziennika zdarzeń, a konsument wznawia od numeru sekwencji.
+        
+        UZASADNIENIE BIZNESOWE:
+        Systemy zewnętrzne zamiast pobierać i porównywać całą listę zamówień
+        czytają tylko nowe zdarzenia od miejsca, w którym skończyły.
+        """
+        order_id = place_order(client, {sample_product: 1})
+        client.post(f'/api/orders/{order_id}/confirm')
+        
+        first = client.get('/api/events').get_json()
+        assert [e['type'] for e in first['events']] == ['order.created', 'order.confirmed']
+        assert first['events'][0]['payload']['order']['id'] == order_id
+        
+        client.post(f'/api/orders/{order_id}/complete')
+        resumed = client.get(f"/api/events?after={first['next_after']}").get_json()
+        
+        assert [e['type'] for e in resumed['events']] == ['order.completed']
+        assert resumed['events'][0]['payload'] == {
+            'id': order_id, 'status': 'completed', 'previous_status': 'confirmed'
+        }
+    
+    def test_long_poll_returns_when_event_is_committed(self, make_app, place_order):
+        """
+        TEST 26: Długie odpytywanie kończy się zaraz po zapisaniu nowego zdarzenia.
+        
+        UZASADNIENIE BIZNESOWE:
+        Konsument czeka tanio na serwerze zamiast odpytywać bazę co chwilę,
+        a mimo to dostaje nowe zamówienie bez zbędnego opóźnienia.
+        """
+        app = make_app()
+        client = app.test_client()
+        product_id = client.post('/api/products',
+            data=json.dumps({'name': 'Kubek', 'price': 10.0, 'stock': 5}),
+            content_type='application/json'
+        ).get_json()['id']
+        start = client.get('/api/events').get_json()['next_after']
+        timer = threading.Timer(0.2, place_order, args=(app.test_client(), {product_id: 1}))
+        timer.start()
+        
+        response = client.get(f'/api/events?after={start}&timeout=10')
+        timer.join()
+        
+        assert response.status_code == 200
+        assert [e['type'] for e in response.get_json()['events']] == ['order.created']
+    
+    def test_resume_from_pruned_sequence_is_rejected(self, app, client, sample_product, place_order):
+        """
+        TEST 27: Wznowienie od zdarzeń usuniętych przez retencję zwraca 410.
+        
+        UZASADNIENIE BIZNESOWE:
+        Konsument, który przegapił usunięte zdarzenia, musi o tym wiedzieć
+        i wykonać pełną synchronizację - inaczej po cichu zgubiłby zmiany.
+        """
+        from datetime import datetime, timedelta
+        from app.services import EventService
+        
+        place_order(client, {sample_product: 1})
+        place_order(client, {sample_product: 1})
+        with app.app_context():
+            assert EventService.prune_events(datetime.utcnow() + timedelta(seconds=1)) == 2
+        last = place_order(client, {sample_product: 1})
+        
+        response = client.get('/api/events?after=1')
+        
+        assert response.status_code == 410
+        assert response.get_json()['oldest_seq'] == 3
+        assert client.get('/api/events?after=2').get_json()['events'][0]['aggregate_id'] == last
+
+
+class TestOrderStreamAPI:
+    """Testy integracyjne strumienia SSE ze zmianami statusów zamówień."""
+    
+    @pytest.fixture
+    def stream_app(self, make_app):
+        return make_app(SSE_BUFFER_SIZE=2, SSE_HEARTBEAT_SECONDS=0.1)
+    
+    def _next_message(self, chunks):
+        for chunk in chunks:
+            text = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if not text.startswith((':', 'retry:')):
+                return dict(line.split(': ', 1) for line in text.strip().split('\n'))
+    
+    def test_stream_pushes_status_changes_for_watched_status(self, stream_app, place_order):
+        """
+        TEST 28: Strumień SSE wysyła zmiany zamówień wchodzących i wychodzących ze statusu 'pending'.
+        
+        UZASADNIENIE BIZNESOWE:
+        Panel operacyjny pokazuje zamówienia oczekujące. Zamiast odpytywać API co kilka
+        sekund z każdej karty przeglądarki, dostaje powiadomienie o nowym zamówieniu
+        i o jego potwierdzeniu (zniknięciu z listy oczekujących).
+        """
+        client = stream_app.test_client()
+        product_id = client.post('/api/products',
+            data=json.dumps({'name': 'Kubek', 'price': 10.0, 'stock': 5}),
+            content_type='application/json'
+        ).get_json()['id']
+        response = client.get('/api/orders/stream?status=pending', buffered=False)
+        chunks = iter(response.response)
+        
+        order_id = place_order(client, {product_id: 1})
+        client.post(f'/api/orders/{order_id}/confirm')
+        client.post(f'/api/orders/{order_id}/complete')  # confirmed -> completed: poza filtrem
+        
+        created = self._next_message(chunks)
+        confirmed = self._next_message(chunks)
+        response.close()
+        
+        assert response.mimetype == 'text/event-stream'
+        assert created['event'] == 'order.created'
+        assert json.loads(created['data'])['id'] == order_id
+        assert confirmed['event'] == 'order.confirmed'
+        assert int(confirmed['id']) > int(created['id'])
+    
+    def test_slow_consumer_is_dropped_and_resumes_from_last_event(self, stream_app, place_order):
+        """
+        TEST 29: Zbyt wolny odbiorca jest rozłączany i wznawia strumień od ostatniego zdarzenia.
+        
+        UZASADNIENIE BIZNESOWE:
+        Jedna zawieszona karta przeglądarki nie może zużywać pamięci serwera bez ograniczeń.
+        Po ponownym połączeniu z Last-Event-ID panel nie traci żadnej zmiany.
+        """
+        client = stream_app.test_client()
+        product_id = client.post('/api/products',
+            data=json.dumps({'name': 'Kubek', 'price': 10.0, 'stock': 10}),
+            content_type='application/json'
+        ).get_json()['id']
+        broadcaster = stream_app.extensions['order_broadcaster']
+        response = client.get('/api/orders/stream', buffered=False)
+        chunks = iter(response.response)
+        
+        order_ids = [place_order(client, {product_id: 1}) for _ in range(4)]
+        deadline = time.monotonic() + 5
+        while broadcaster._subscribers and time.monotonic() < deadline:
+            time.sleep(0.01)
+        
+        received = [self._next_message(chunks), self._next_message(chunks)]
+        overflow = self._next_message(chunks)
+        response.close()
+        
+        assert [json.loads(m['data'])['id'] for m in received] == order_ids[:2]
+        assert overflow['event'] == 'overflow'
+        
+        resumed = client.get('/api/orders/stream', buffered=False,
+                             headers={'Last-Event-ID': received[-1]['id']})
+        resumed_chunks = iter(resumed.response)
+        replayed = [self._next_message(resumed_chunks) for _ in range(2)]
+        resumed.close()
+        
+        assert [json.loads(m['data'])['id'] for m in replayed] == order_ids[2:]
+
+
+class TestProductSearchAPI:
+    """Testy integracyjne wyszukiwania produktów po nazwie."""
+    
+    def _create_product(self, client, name):
+        return client.post('/api/products',
+            data=json.dumps({'name': name, 'price': 10.0, 'stock': 1}),
+            content_type='application/json'
+        ).get_json()['id']
+    
+    def test_search_matches_word_prefixes_with_pagination(self, client):
+        """
+        TEST 30: Wyszukiwanie znajduje produkty po początkach słów i stronicuje wyniki.
+        
+        UZASADNIENIE BIZNESOWE:
+        Sprzedawca wpisuje fragment nazwy ("lap pro") i od razu widzi pasujące
+        produkty, zamiast pobierać cały katalog i filtrować go po stronie klienta.
+        """
+        pro = self._create_product(client, 'Laptop Pro 14')
+        air = self._create_product(client, 'Laptop Air')
+        self._create_product(client, 'Myszka bezprzewodowa')
+        
+        both = client.get('/api/products/search?q=lap').get_json()
+        narrowed = client.get('/api/products/search?q=lap%20pro').get_json()
+        first_page = client.get('/api/products/search?q=laptop&per_page=1').get_json()
+        
+        assert sorted(p['id'] for p in both['items']) == sorted([pro, air])
+        assert [p['id'] for p in narrowed['items']] == [pro]
+        assert len(first_page['items']) == 1
+        assert first_page['has_more'] is True
+        assert client.get('/api/products/search?q=').status_code == 400
+    
+    def test_search_index_follows_product_rename(self, client):
+        """
+        TEST 31: Zmiana nazwy produktu od razu zmienia wyniki wyszukiwania.
+        
+        UZASADNIENIE BIZNESOWE:
+        Po poprawieniu nazwy w katalogu klienci muszą znajdować produkt
+        pod nową nazwą, a nie pod starą.
+        """
+        product_id = self._create_product(client, 'Klawiatura')
+        
+        response = client.patch(f'/api/products/{product_id}',
+            data=json.dumps({'name': 'Keyboard mechaniczna'}),
+            content_type='application/json'
+        )
+        
+        assert response.status_code == 200
+        assert client.get('/api/products/search?q=klaw').get_json()['items'] == []
+        found = client.get('/api/products/search?q=mech').get_json()['items']
+        assert [p['id'] for p in found] == [product_id]
+    
+    def test_like_fallback_matches_same_word_prefixes_as_fts(self, app, client):
+        """
+        TEST 62: Bez FTS5 wyszukiwanie zwraca te same produkty co z FTS5.
+        
+        UZASADNIENIE BIZNESOWE:
+        Baza bez FTS5 (inna baza danych, starszy SQLite) nie może zmieniać
+        wyników wyszukiwania - "pro" ma znaleźć "Laptop Pro 14", a nie
+        tylko nazwy zaczynające się od "pro".
+        """
+        from app.search import search_products
+        
+        pro = self._create_product(client, 'Laptop Pro 14')
+        self._create_product(client, 'Laptop Air')
+        program = self._create_product(client, 'programator USB')
+        self._create_product(client, 'Myszka bezprzewodowa')
+        
+        with app.app_context():
+            for query in ['pro', 'LAP pro', 'usb', 'air lap', 'myszka prze']:
+                fts = {p.id for p in search_products(query, 10, 0, fts5=True)}
+                fallback = {p.id for p in search_products(query, 10, 0, fts5=False)}
+                assert fallback == fts, query
+            assert {p.id for p in search_products('pro', 10, 0, fts5=False)} == {pro, program}
+
+
+class TestLowStockAPI:
+    """Testy integracyjne listy produktów na wyczerpaniu."""
+    
+    def test_low_stock_watchlist_follows_stock_changes(self, client, sample_products):
+        """
+        TEST 35: Produkty spadające poniżej progu trafiają na listę, a po dostawie z niej znikają.
+        
+        UZASADNIENIE BIZNESOWE:
+        Dział zakupów wiele razy na godzinę sprawdza, co trzeba domówić.
+        Lista musi być aktualna zaraz po zamówieniu i po uzupełnieniu stanu,
+        bez pobierania całego katalogu.
+        """
+        laptop_id, mouse_id, keyboard_id = sample_products
+        client.patch(f'/api/products/{mouse_id}/reorder-threshold',
+            data=json.dumps({'reorder_threshold': 18}),
+            content_type='application/json'
+        )
+        assert client.get('/api/products/low-stock').get_json() == []
+        rejected = client.patch(f'/api/products/{mouse_id}/reorder-threshold',
+            data=json.dumps({'reorder_threshold': True}),
+            content_type='application/json'
+        )
+        assert rejected.status_code == 400
+        events = client.get('/api/events').get_json()['events']
+        assert [(e['type'], e['payload']) for e in events] == [
+            ('product.updated', {'id': mouse_id, 'reorder_threshold': 18})
+        ]
+        
+        client.post('/api/orders',
+            data=json.dumps({
+                'customer_name': 'Test',
+                'customer_email': 'test@test.com',
+                'items': [{'product_id': mouse_id, 'quantity': 3}]
+            }),
+            content_type='application/json'
+        )
+        flagged = client.get('/api/products/low-stock').get_json()
+        assert [p['id'] for p in flagged] == [mouse_id]
+        assert flagged[0]['low_stock_since'] is not None
+        
+        client.patch(f'/api/products/{mouse_id}/stock',
+            data=json.dumps({'quantity_change': 10}),
+            content_type='application/json'
+        )
+        assert client.get('/api/products/low-stock').get_json() == []
+        
+        below_six = client.get('/api/products/low-stock?threshold=6').get_json()
+        assert [p['id'] for p in below_six] == [keyboard_id, laptop_id]
+    
+    def test_watchlist_covers_new_products_and_threshold_changes(self, make_app):
+        """
+        TEST 70: Nowy produkt z niskim stanem i zmiana progu domyślnego aktualizują listę.
+        
+        UZASADNIENIE BIZNESOWE:
+        Produkt dodany do katalogu z dwiema sztukami trzeba domówić od razu,
+        a nie dopiero po pierwszej sprzedaży. Po zmianie progu domyślnego
+        (restart z nowym LOW_STOCK_DEFAULT_THRESHOLD) lista od razu
+        odpowiada nowemu progowi, także dla produktów, których stan się nie zmienił.
+        """
+        app = make_app(LOW_STOCK_DEFAULT_THRESHOLD=5)
+        client = app.test_client()
+        ids = [
+            client.post('/api/products',
+                data=json.dumps({'name': name, 'price': 10.0, 'stock': stock}),
+                content_type='application/json'
+            ).get_json()['id']
+            for name, stock in [('Toner', 2), ('Papier', 10)]
+        ]
+        assert [p['id'] for p in client.get('/api/products/low-stock').get_json()] == ids[:1]
+        
+        uri = app.config['SQLALCHEMY_DATABASE_URI']
+        raised = make_app(SQLALCHEMY_DATABASE_URI=uri, LOW_STOCK_DEFAULT_THRESHOLD=12).test_client()
+        assert [p['id'] for p in raised.get('/api/products/low-stock').get_json()] == ids
+        low_stock_events = [
+            e['payload']['id'] for e in raised.get('/api/events').get_json()['events']
+            if e['type'] == 'product.low_stock'
+        ]
+        assert low_stock_events == ids
+        
+        disabled = make_app(SQLALCHEMY_DATABASE_URI=uri).test_client()
+        assert disabled.get('/api/products/low-stock').get_json() == []
+
+
+class TestAdmissionControl:
+    """Testy integracyjne limitów żądań i kontroli przeciążenia."""
+    
+    def _rate_limited_app(self, make_app, **overrides):
+        settings = {
+            'RATELIMIT_ENABLED': True,
+            'RATELIMIT_WRITE_RATE': 0.5,
+            'RATELIMIT_WRITE_BURST': 2,
+        }
+        settings.update(overrides)
+        return make_app(**settings)
+    
+    def test_write_budget_exhaustion_returns_429(self, make_app):
+        """
+        TEST 36: Klient przekraczający limit zapisów dostaje 429, a odczyty i health check działają dalej.
+        
+        UZASADNIENIE BIZNESOWE:
+        Partner zalewający API zamówieniami nie może spowolnić pozostałych klientów.
+        Dostaje szybką odmowę z informacją, kiedy spróbować ponownie.
+        """
+        # Klienci rozróżniani nagłówkiem ustawianym przez zaufane proxy
+        app = self._rate_limited_app(make_app, RATELIMIT_TRUSTED_PROXIES=['127.0.0.1'])
+        client = app.test_client()
+        headers = {'X-Client-Id': 'partner-a'}
+        
+        statuses = [
+            client.post('/api/products', headers=headers,
+                data=json.dumps({'name': 'P', 'price': 1.0}),
+                content_type='application/json'
+            ) for _ in range(3)
+        ]
+        other_client = client.post('/api/products', headers={'X-Client-Id': 'partner-b'},
+            data=json.dumps({'name': 'P', 'price': 1.0}),
+            content_type='application/json'
+        )
+        
+        assert [r.status_code for r in statuses] == [201, 201, 429]
+        assert int(statuses[-1].headers['Retry-After']) >= 1
+        assert other_client.status_code == 201
+        assert client.get('/api/products', headers=headers).status_code == 200
+        assert client.get('/api/health', headers=headers).status_code == 200
+    
+    def test_requests_over_concurrency_limit_are_rejected_fast(self, make_app):
+        """
+        TEST 37: Gdy wszystkie miejsca na zapisy są zajęte, kolejny zapis dostaje od razu 503.
+        
+        UZASADNIENIE BIZNESOWE:
+        Przy przeciążeniu lepiej szybko odmówić z Retry-After niż ustawiać żądania
+        w kolejce, w której czekają wszyscy - łącznie z health checkiem.
+        """
+        app = self._rate_limited_app(make_app, RATELIMIT_MAX_CONCURRENT_WRITES=1)
+        client = app.test_client()
+        slots = app.extensions['rate_limiter'].slots['write']
+        
+        assert slots.acquire(blocking=False)  # zapis w toku
+        busy = client.post('/api/products',
+            data=json.dumps({'name': 'P', 'price': 1.0}),
+            content_type='application/json'
+        )
+        reads = client.get('/api/products')
+        health = client.get('/api/health')
+        slots.release()
+        after = client.post('/api/products',
+            data=json.dumps({'name': 'P', 'price': 1.0}),
+            content_type='application/json'
+        )
+        
+        assert busy.status_code == 503
+        assert busy.headers['Retry-After'] == '1'
+        assert reads.status_code == 200
+        assert health.status_code == 200
+        assert after.status_code == 201
+    
+    def test_shared_store_applies_budget_across_workers(self, make_app, tmp_path):
+        """
+        TEST 38: Limit zapisany we wspólnym pliku SQLite obowiązuje wszystkie procesy robocze.
+        
+        UZASADNIENIE BIZNESOWE:
+        Przy kilku workerach limit per proces pozwoliłby klientowi na N razy więcej
+        żądań. Wspólny stan gwarantuje ten sam budżet niezależnie od workera.
+        """
+        storage = str(tmp_path / 'ratelimit.db')
+        workers = [self._rate_limited_app(make_app, RATELIMIT_STORAGE_PATH=storage) for _ in range(2)]
+        headers = {'X-Client-Id': 'partner-a'}
+        
+        statuses = [
+            workers[i % 2].test_client().post('/api/products', headers=headers,
+                data=json.dumps({'name': 'P', 'price': 1.0}),
+                content_type='application/json'
+            ).status_code
+            for i in range(3)
+        ]
+        
+        assert statuses == [201, 201, 429]
+    
+    def test_rotating_client_header_does_not_reset_budget(self, make_app):
+        """
+        TEST 65: Zmiana nagłówka X-Client-Id przy każdym żądaniu nie daje nowego limitu.
+        
+        UZASADNIENIE BIZNESOWE:
+        Nagłówek wybiera sam klient. Gdyby wyznaczał limit, zalewający API
+        klient wysyłałby co żądanie inną wartość i nigdy nie dostałby 429.
+        Bez zaufanego proxy limit liczy się per adres klienta.
+        """
+        app = self._rate_limited_app(make_app)
+        client = app.test_client()
+        
+        statuses = [
+            client.post('/api/products', headers={'X-Client-Id': f'partner-{i}'},
+                data=json.dumps({'name': 'P', 'price': 1.0}),
+                content_type='application/json'
+            ).status_code
+            for i in range(3)
+        ]
+        other_address = client.post('/api/products',
+            environ_base={'REMOTE_ADDR': '10.0.0.2'},
+            data=json.dumps({'name': 'P', 'price': 1.0}),
+            content_type='application/json'
+        )
+        
+        assert statuses == [201, 201, 429]
+        assert other_address.status_code == 201
+    
+    def test_bucket_store_keeps_most_recent_clients(self):
+        """
+        TEST 66: Pamięć limitów ma twardy limit klientów i zapomina najdawniej widzianych.
+        
+        UZASADNIENIE BIZNESOWE:
+        Ruch z wielu adresów nie może zająć całej pamięci serwera, a koszt
+        obsługi nowego klienta nie może rosnąć z liczbą zapamiętanych.
+        """
+        from app.ratelimit import MemoryBucketStore
+        
+        store = MemoryBucketStore(max_clients=2)
+        store.take('a', 1, 1)
+        store.take('b', 1, 1)
+        assert store.take('a', 1, 1) > 0  # "a" widziany ostatnio
+        store.take('c', 1, 1)
+        
+        assert list(store._buckets) == ['a', 'c']
+        assert store.take('a', 1, 1) > 0
+    
+    def test_batch_takes_one_write_token_per_operation(self, make_app):
+        """
+        TEST 67: Batch zużywa limit zapisów za każdą operację, nie jak jedno żądanie.
+        
+        UZASADNIENIE BIZNESOWE:
+        Gdyby batch liczył się jako jeden zapis, klient pakujący po 50 operacji
+        miałby 50 razy większy limit niż pozostali. Batch oszczędza podróże
+        w sieci, nie limit. Odrzucony batch nie wykonuje żadnej operacji.
+        """
+        app = self._rate_limited_app(make_app, RATELIMIT_WRITE_BURST=5)
+        client = app.test_client()
+        
+        def batch(size):
+            operations = [
+                {'method': 'POST', 'path': '/api/products', 'body': {'name': f'P{i}', 'price': 1.0}}
+                for i in range(size)
+            ]
+            return client.post('/api/batch',
+                data=json.dumps({'operations': operations}),
+                content_type='application/json'
+            )
+        
+        too_big = batch(6)
+        client.post('/api/products',
+            data=json.dumps({'name': 'P', 'price': 1.0}),
+            content_type='application/json'
+        )
+        over_remaining = batch(5)
+        
+        assert too_big.status_code == 429
+        assert 'Retry-After' not in too_big.headers
+        assert over_remaining.status_code == 429
+        assert over_remaining.headers['Retry-After']
+        assert len(client.get('/api/products').get_json()) == 1
+        assert batch(4).status_code == 200
+        assert len(client.get('/api/products').get_json()) == 5
+
+
+class TestOrderSharding:
+    """Testy integracyjne podziału zamówień na kilka baz (shardy)."""
+    
+    def _sharded_app(self, make_app, tmp_path, shards=3):
+        binds = {f'orders_{i}': f"sqlite:///{tmp_path / f'orders_{i}.db'}" for i in range(shards)}
+        return make_app(SQLALCHEMY_BINDS=binds, ORDER_SHARD_BINDS=list(binds))
+    
+    def test_orders_are_spread_over_shards_and_found_by_id(self, make_app, tmp_path, place_order):
+        """
+        TEST 45: Zamówienia trafiają do różnych baz, a ID wskazuje bazę zamówienia.
+        
+        UZASADNIENIE BIZNESOWE:
+        Jedna baza nie przyjmie całego ruchu zamówień. Zamówienia klienta
+        trafiają zawsze do tej samej bazy, podgląd po ID czyta tylko ją,
+        a lista zamówień łączy wyniki wszystkich baz. Stan magazynowy
+        zostaje w bazie centralnej.
+        """
+        from app.sharding import shard_of_id
+        
+        app = self._sharded_app(make_app, tmp_path)
+        client = app.test_client()
+        product = json.loads(client.post('/api/products',
+            data=json.dumps({'name': 'Laptop', 'price': 100.0, 'stock': 50}),
+            content_type='application/json'
+        ).data)
+        
+        order_ids = [
+            place_order(client, {product['id']: 1}, customer_email=f'klient{i}@example.com')
+            for i in range(12)
+        ]
+        
+        assert len({shard_of_id(order_id) for order_id in order_ids}) > 1
+        order = json.loads(client.get(f'/api/orders/{order_ids[5]}').data)
+        assert order['customer_email'] == 'klient5@example.com'
+        assert order['items'][0]['product_name'] == 'Laptop'
+        assert client.get(f'/api/orders/{order_ids[-1] + 1024}').status_code == 404
+        
+        listed = json.loads(client.get('/api/orders').data)
+        assert sorted(o['id'] for o in listed) == sorted(order_ids)
+        assert [o['created_at'] for o in listed] == sorted(o['created_at'] for o in listed)
+        
+        client.post(f'/api/orders/{order_ids[0]}/cancel')
+        pending = json.loads(client.get('/api/orders?status=pending').data)
+        assert sorted(o['id'] for o in pending) == sorted(order_ids[1:])
+        stock = json.loads(client.get(f"/api/products/{product['id']}").data)['stock']
+        assert stock == 50 - 12 + 1
+    
+    def test_bulk_cancel_and_reports_span_all_shards(self, make_app, tmp_path, place_order):
+        """
+        TEST 46: Masowe anulowanie i raporty obejmują zamówienia ze wszystkich baz.
+        
+        SCENARIUSZ BIZNESOWY:
+        Obsługa anuluje zamówienia zapisane w różnych bazach jednym żądaniem.
+        Towar wraca na stan, a przebudowane raporty zgadzają się z raportami
+        prowadzonymi na bieżąco.
+        """
+        app = self._sharded_app(make_app, tmp_path)
+        client = app.test_client()
+        product = json.loads(client.post('/api/products',
+            data=json.dumps({'name': 'Mysz', 'price': 10.0, 'stock': 30}),
+            content_type='application/json'
+        ).data)
+        order_ids = [
+            place_order(client, {product['id']: 1}, customer_email=f'klient{i}@example.com')
+            for i in range(9)
+        ]
+        
+        response = client.post('/api/orders/bulk/cancel',
+            data=json.dumps({'order_ids': order_ids[:6] + [order_ids[-1] + 1024]}),
+            content_type='application/json'
+        )
+        result = json.loads(response.data)
+        
+        assert result['transitioned'] == order_ids[:6]
+        assert result['rejected'] == [{'id': order_ids[-1] + 1024, 'error': 'Order not found'}]
+        assert json.loads(client.get(f"/api/products/{product['id']}").data)['stock'] == 30 - 3
+        
+        incremental = json.loads(client.get('/api/reports/revenue-by-status').data)
+        with app.app_context():
+            from app.services import ReportService
+            ReportService.rebuild_rollups()
+        rebuilt = json.loads(client.get('/api/reports/revenue-by-status').data)
+        
+        assert rebuilt == incremental
+        assert {row['status']: row['order_count'] for row in rebuilt} == {'cancelled': 6, 'pending': 3}
+
+
+class TestOrderExport:
+    """Testy integracyjne eksportu i strumieniowego odczytu zamówień."""
+    
+    def test_export_orders_writes_one_json_line_per_order(self, app, client, sample_product, place_order):
+        """
+        TEST 47: Komenda export-orders zapisuje każde zamówienie jako osobną linię JSON.
+        
+        UZASADNIENIE BIZNESOWE:
+        Księgowość i hurtownia danych pobierają pełną historię zamówień.
+        Eksport musi działać strumieniowo - niezależnie od liczby zamówień -
+        i dać się zawęzić do jednego statusu.
+        """
+        for _ in range(5):
+            place_order(client, {sample_product: 1})
+        client.post('/api/orders/1/cancel')
+        runner = app.test_cli_runner()
+        
+        result = runner.invoke(args=['export-orders'])
+        cancelled = runner.invoke(args=['export-orders', '--status', 'cancelled'])
+        
+        assert result.exit_code == 0
+        orders = [json.loads(line) for line in result.stdout.splitlines()]
+        assert [o['id'] for o in orders] == [1, 2, 3, 4, 5]
+        assert orders[0]['items'][0]['product_name'] == 'Test Product'
+        assert [json.loads(line)['id'] for line in cancelled.stdout.splitlines()] == [1]
+        assert 'Exported 1 orders' in cancelled.stderr
+    
+    def test_iteration_releases_orders_batch_by_batch(self, app, client, sample_product, place_order):
+        """
+        TEST 48: Odczyt strumieniowy zwalnia przetworzone zamówienia z sesji.
+        
+        UZASADNIENIE BIZNESOWE:
+        Zadania przechodzące po milionach zamówień nie mogą trzymać ich
+        wszystkich w pamięci do końca - sesja przechowuje najwyżej bieżącą
+        partię.
+        """
+        from app.models import db, Order
+        from app.services import OrderService
+        
+        for _ in range(7):
+            place_order(client, {sample_product: 1})
+        
+        with app.app_context():
+            db.session.expunge_all()
+            largest_session = 0
+            seen = []
+            for order in OrderService.iter_all_orders(batch_size=3):
+                seen.append((order.id, len(order.items)))
+                largest_session = max(largest_session, sum(
+                    1 for obj in db.session.identity_map.values() if isinstance(obj, Order)
+                ))
+            
+            assert seen == [(o.id, len(o.items)) for o in OrderService.get_all_orders()]
+            assert largest_session <= 3
+
+
+class TestReservationExpiry:
+    """Testy integracyjne wygaszania rezerwacji stocku."""
+    
+    def test_expire_orders_releases_stock_of_stale_pending_orders(self, app, client, sample_product):
+        """
+        TEST 50: Komenda expire-orders anuluje tylko przeterminowane zamówienia "pending".
+        
+        UZASADNIENIE BIZNESOWE:
+        Nieopłacone zamówienie rezerwuje towar od razu. Porzucone zamówienia
+        nie mogą blokować stocku w nieskończoność, ale świeże zamówienia
+        i zamówienia już potwierdzone muszą zostać nietknięte.
+        """
+        from datetime import datetime, timedelta
+        from app.models import db, Order, Product
+        
+        for i, quantity in enumerate([2, 3, 1]):
+            client.post('/api/orders',
+                data=json.dumps({
+                    'customer_name': f'Klient {i}',
+                    'customer_email': f'klient{i}@example.com',
+                    'items': [{'product_id': sample_product, 'quantity': quantity}]
+                }),
+                content_type='application/json'
+            )
+        client.post('/api/orders/2/confirm')
+        with app.app_context():
+            # Zamówienia 1 i 2 złożono dwie godziny temu, zamówienie 3 przed chwilą
+            db.session.execute(
+                db.update(Order).where(Order.id.in_([1, 2]))
+                .values(created_at=datetime.utcnow() - timedelta(hours=2))
+            )
+            db.session.commit()
+        
+        result = app.test_cli_runner().invoke(args=['expire-orders', '--minutes', '30'])
+        
+        assert result.exit_code == 0
+        assert 'Expired 1 orders, released 2 units of 1 products' in result.output
+        statuses = {o['id']: o['status'] for o in json.loads(client.get('/api/orders').data)}
+        assert statuses == {1: 'cancelled', 2: 'confirmed', 3: 'pending'}
+        with app.app_context():
+            assert db.session.get(Product, sample_product).stock == 10 - 3 - 1
+        events = json.loads(client.get('/api/events').data)['events']
+        assert events[-1]['type'] == 'order.cancelled'
+        assert events[-1]['aggregate_id'] == 1
+    
+    def test_sweeper_expires_orders_and_reports_released_stock(self, make_app):
+        """
+        TEST 51: Sweeper w tle wygasza rezerwacje i raportuje zwolniony stock.
+        
+        UZASADNIENIE BIZNESOWE:
+        Nikt nie musi pamiętać o ręcznym anulowaniu porzuconych zamówień.
+        Magazyn widzi w metrykach, ile towaru wróciło na stan i których
+        produktów dotyczyło.
+        """
+        app = make_app(ORDER_RESERVATION_TTL_MINUTES=0, ORDER_EXPIRY_INTERVAL=0.05)
+        client = app.test_client()
+        product_id = json.loads(client.post('/api/products',
+            data=json.dumps({'name': 'Monitor', 'price': 800.0, 'stock': 10}),
+            content_type='application/json'
+        ).data)['id']
+        client.post('/api/orders',
+            data=json.dumps({
+                'customer_name': 'Jan Kowalski',
+                'customer_email': 'jan@example.com',
+                'items': [{'product_id': product_id, 'quantity': 4}]
+            }),
+            content_type='application/json'
+        )
+        
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            metrics = json.loads(client.get('/api/orders/expiry').data)
+            if metrics['orders_expired']:
+                break
+            time.sleep(0.05)
+        
+        assert json.loads(client.get('/api/orders/1').data)['status'] == 'cancelled'
+        assert json.loads(client.get(f'/api/products/{product_id}').data)['stock'] == 10
+        assert metrics['enabled'] is True
+        assert metrics['orders_expired'] == 1
+        assert metrics['units_released'] == 4
+        assert metrics['released_by_product'] == [{'product_id': product_id, 'units': 4}]
+
+
+class TestOptimisticConcurrency:
+    """Testy integracyjne optymistycznej kontroli współbieżności."""
+    
+    @staticmethod
+    def _concurrent_writer(app, product_id, times):
+        """Symuluje inny proces zmieniający produkt tuż przed zapisem."""
+        from sqlalchemy import update
+        from app.models import db, Product
+        
+        remaining = [times]
+        
+        def bump(session, flush_context, instances):
+            if remaining[0] and any(isinstance(obj, Product) for obj in session.dirty):
+                remaining[0] -= 1
+                products = Product.__table__
+                # Osobne połączenie i osobna, zatwierdzona transakcja
+                with db.engine.connect() as connection:
+                    connection.execute(
+                        update(products).where(products.c.id == product_id)
+                        .values(stock=products.c.stock + 100, version=products.c.version + 1)
+                    )
+                    connection.commit()
+        return bump
+    
+    @staticmethod
+    def _product(client, stock):
+        return json.loads(client.post('/api/products',
+            data=json.dumps({'name': 'Monitor', 'price': 800.0, 'stock': stock}),
+            content_type='application/json'
+        ).data)['id']
+    
+    def test_stale_write_is_retried_on_fresh_data(self, make_app):
+        """
+        TEST 52: Zapis przegrywający z równoległą zmianą jest powtarzany na świeżych danych.
+        
+        UZASADNIENIE BIZNESOWE:
+        Dwóch pracowników magazynu koryguje stan tego samego produktu
+        jednocześnie. Żadna korekta nie może nadpisać drugiej (utracona
+        aktualizacja), a żaden pracownik nie powinien dostać błędu, jeśli
+        ponowienie się udaje.
+        """
+        from sqlalchemy import event
+        from app.sharding import RoutingSession
+        
+        app = make_app()
+        client = app.test_client()
+        product_id = self._product(client, stock=10)
+        listener = self._concurrent_writer(app, product_id, times=1)
+        event.listen(RoutingSession, 'before_flush', listener)
+        try:
+            response = client.patch(f'/api/products/{product_id}/stock',
+                data=json.dumps({'quantity_change': -3}),
+                content_type='application/json'
+            )
+        finally:
+            event.remove(RoutingSession, 'before_flush', listener)
+        
+        assert response.status_code == 200
+        # 10 + 100 (równoległy zapis) - 3 (ponowiona korekta)
+        assert json.loads(response.data)['stock'] == 107
+    
+    def test_persistent_conflict_returns_409_without_changes(self, make_app):
+        """
+        TEST 53: Przy ciągłym konflikcie API zwraca 409 i niczego nie zapisuje.
+        
+        UZASADNIENIE BIZNESOWE:
+        Liczba ponowień jest ograniczona, żeby gorący produkt nie blokował
+        wątków serwera. Klient dostaje jasny sygnał "spróbuj ponownie" (409),
+        a nie błąd walidacji ani częściowo zapisane zamówienie.
+        """
+        from sqlalchemy import event
+        from app.sharding import RoutingSession
+        
+        app = make_app(OPTIMISTIC_LOCK_RETRIES=2)
+        client = app.test_client()
+        product_id = self._product(client, stock=10)
+        listener = self._concurrent_writer(app, product_id, times=3)
+        event.listen(RoutingSession, 'before_flush', listener)
+        try:
+            response = client.post('/api/orders',
+                data=json.dumps({
+                    'customer_name': 'Jan Kowalski',
+                    'customer_email': 'jan@example.com',
+                    'items': [{'product_id': product_id, 'quantity': 2}]
+                }),
+                content_type='application/json'
+            )
+        finally:
+            event.remove(RoutingSession, 'before_flush', listener)
+        
+        assert response.status_code == 409
+        assert 'modified concurrently' in json.loads(response.data)['error']
+        assert json.loads(client.get('/api/orders').data) == []
+        # Trzy równoległe zapisy po +100; zamówienie nie zarezerwowało nic
+        assert json.loads(client.get(f'/api/products/{product_id}').data)['stock'] == 310
+
+
+class TestOrderSnapshot:
+    """Testy integracyjne kolumnowego snapshotu zamówień."""
+    
+    def test_snapshot_analytics_match_sql_reports(self, app, client, sample_products, tmp_path, place_order):
+        """
+        TEST 54: Analizy na snapshocie kolumnowym zgadzają się z raportami SQL.
+        
+        UZASADNIENIE BIZNESOWE:
+        Analitycy liczą przychody i bestsellery na snapshocie, żeby nie
+        obciążać bazy produkcyjnej. Wynik musi być taki sam jak w raportach
+        API - inaczej dwa działy będą pokazywać różne liczby.
+        """
+        np = pytest.importorskip('numpy')
+        from app.analytics import OrderSnapshot
+        
+        laptop, mouse, _ = sample_products
+        place_order(client, {laptop: 1, mouse: 2})
+        cancelled = place_order(client, {mouse: 5})
+        confirmed = place_order(client, {laptop: 2, mouse: 1})
+        client.post(f'/api/orders/{cancelled}/cancel')
+        client.post(f'/api/orders/{confirmed}/confirm')
+        path = tmp_path / 'snapshot'
+        
+        result = app.test_cli_runner().invoke(args=['snapshot-orders', '--output', str(path)])
+        
+        assert result.exit_code == 0
+        assert 'Wrote 3 orders and 5 items' in result.output
+        snapshot = OrderSnapshot(str(path))
+        assert snapshot.revenue_by_status() == json.loads(client.get('/api/reports/revenue-by-status').data)
+        assert snapshot.top_products() == json.loads(client.get('/api/reports/top-products').data)
+        daily = json.loads(client.get('/api/reports/daily-revenue?status=confirmed').data)
+        assert snapshot.daily_revenue(['confirmed']) == [
+            {k: row[k] for k in ('day', 'order_count', 'revenue')} for row in daily
+        ]
+        # Kolumny słownikowe: status i produkt zapisane jako małe kody
+        assert snapshot['order_status'].dtype == np.uint8
+        assert snapshot['item_product'].dtype == np.uint16
+        assert list(snapshot['product_ids']) == [laptop, mouse]
+    
+    def test_snapshot_is_replaced_only_when_complete(self, app, client, sample_products, tmp_path, place_order):
+        """
+        TEST 55: Nowy snapshot zastępuje poprzedni dopiero po zapisaniu w całości.
+        
+        SCENARIUSZ BIZNESOWY:
+        Snapshot odświeżany jest co noc, a analitycy mogą w tym czasie
+        czytać poprzedni. Do czasu odświeżenia widzą stan z chwili
+        zapisu, po nim - nowe zamówienia; nigdy połowę plików.
+        """
+        pytest.importorskip('numpy')
+        from app.analytics import OrderSnapshot
+        
+        laptop, mouse, _ = sample_products
+        place_order(client, {mouse: 3})
+        path = tmp_path / 'snapshot'
+        runner = app.test_cli_runner()
+        runner.invoke(args=['snapshot-orders', '--output', str(path)])
+        before = OrderSnapshot(str(path))
+        
+        place_order(client, {laptop: 1})
+        assert before.meta['orders'] == 1
+        runner.invoke(args=['snapshot-orders', '--output', str(path)])
+        after = OrderSnapshot(str(path))
+        
+        assert after.meta['orders'] == 2
+        assert [p['product_id'] for p in after.top_products()] == [mouse, laptop]
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['snapshot']
+
+
+class TestOrderResponseCache:
+    """Testy integracyjne cache odpowiedzi zamówień."""
+    
+    @staticmethod
+    def _setup(app):
+        client = app.test_client()
+        product_id = json.loads(client.post('/api/products',
+            data=json.dumps({'name': 'Monitor', 'price': 800.0, 'stock': 10}),
+            content_type='application/json'
+        ).data)['id']
+        order_ids = [
+            json.loads(client.post('/api/orders',
+                data=json.dumps({
+                    'customer_name': 'Jan Kowalski',
+                    'customer_email': 'jan@example.com',
+                    'items': [{'product_id': product_id, 'quantity': 1}]
+                }),
+                content_type='application/json'
+            ).data)['id']
+            for _ in range(2)
+        ]
+        return client, product_id, order_ids
+    
+    @staticmethod
+    def _count_statements(app, fn):
+        from sqlalchemy import event
+        from app.models import db
+        
+        statements = []
+        def record(*args):
+            statements.append(args[2])
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            result = fn()
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+        return result, len(statements)
+    
+    def test_terminal_orders_are_served_from_cache(self, make_app):
+        """
+        TEST 56: Zakończone zamówienia są serwowane z cache, aktywne po zmianie statusu są świeże.
+        
+        UZASADNIENIE BIZNESOWE:
+        Klienci wielokrotnie otwierają historię zamówień, które już się
+        nie zmienią. Takie odpowiedzi nie muszą za każdym razem czytać bazy,
+        a przeglądarka klienta może je trzymać na stałe. Zamówienie w toku
+        zaraz po zmianie statusu musi jednak pokazać nowy status.
+        """
+        app = make_app(ORDER_CACHE_ENABLED=True, ORDER_CACHE_TTL_SECONDS=60)
+        client, _, (pending, cancelled) = self._setup(app)
+        client.post(f'/api/orders/{cancelled}/cancel')
+        
+        first = client.get(f'/api/orders/{cancelled}')
+        second, statements = self._count_statements(app, lambda: client.get(f'/api/orders/{cancelled}'))
+        
+        assert second.status_code == 200
+        assert second.data == first.data
+        assert statements == 0
+        assert second.headers['Cache-Control'] == 'private, max-age=31536000, immutable'
+        
+        assert client.get(f'/api/orders/{pending}').headers['Cache-Control'] == 'no-cache'
+        client.post(f'/api/orders/{pending}/confirm')
+        assert json.loads(client.get(f'/api/orders/{pending}').data)['status'] == 'confirmed'
+    
+    def test_evicted_orders_spill_to_disk(self, make_app, tmp_path):
+        """
+        TEST 57: Zamówienia usunięte z pamięci cache trafiają na dysk.
+        
+        UZASADNIENIE BIZNESOWE:
+        Pamięć serwera jest ograniczona, ale historia zamówień rośnie
+        bez końca - starsze odpowiedzi czekają w pliku na dysku i nadal
+        nie wymagają odczytu bazy.
+        """
+        app = make_app(
+            ORDER_CACHE_ENABLED=True, ORDER_CACHE_MAX_ENTRIES=1,
+            ORDER_CACHE_PATH=str(tmp_path / 'order-cache')
+        )
+        client, _, order_ids = self._setup(app)
+        client.post('/api/orders/bulk/cancel',
+            data=json.dumps({'order_ids': order_ids}),
+            content_type='application/json'
+        )
+        for order_id in order_ids:
+            client.get(f'/api/orders/{order_id}')
+        
+        response, statements = self._count_statements(app, lambda: client.get(f'/api/orders/{order_ids[0]}'))
+        
+        assert statements == 0
+        assert app.extensions['order_response_cache'].stats['spilled'] >= 1
+        assert json.loads(response.data)['status'] == 'cancelled'
+
+
+class TestOrderItemProductNames:
+    """Testy integracyjne nazw produktów zapisanych w pozycjach zamówień."""
+    
+    def test_order_keeps_product_name_after_rename(self, client, sample_product, place_order):
+        """
+        TEST 58: Zamówienie pokazuje nazwę produktu z chwili zamówienia.
+        
+        UZASADNIENIE BIZNESOWE:
+        Faktura i historia zamówień muszą zgadzać się z tym, co klient
+        kupił - zmiana nazwy w katalogu nie może przepisywać przeszłości.
+        """
+        order_id = place_order(client, {sample_product: 1})
+        
+        client.patch(f'/api/products/{sample_product}',
+            data=json.dumps({'name': 'Test Product v2'}),
+            content_type='application/json'
+        )
+        order = json.loads(client.get(f'/api/orders/{order_id}').data)
+        
+        assert order['items'][0]['product_name'] == 'Test Product'
+        assert json.loads(client.get(f'/api/products/{sample_product}').data)['name'] == 'Test Product v2'
+    
+    def test_backfill_item_names_fills_missing_names(self, app, client, sample_product, place_order):
+        """
+        TEST 59: Komenda backfill-item-names uzupełnia nazwy w starych pozycjach.
+        
+        UZASADNIENIE BIZNESOWE:
+        Pozycje zamówień złożonych przed wdrożeniem nie mają zapisanej
+        nazwy produktu. Migracja uzupełnia je partiami, nie blokując
+        sklepu, i nie rusza pozycji, które nazwę już mają.
+        """
+        from app.models import db, OrderItem
+        
+        order_ids = [place_order(client, {sample_product: 1}) for _ in range(5)]
+        with app.app_context():
+            db.session.execute(db.update(OrderItem).values(product_name=None))
+            db.session.commit()
+        runner = app.test_cli_runner()
+        
+        result = runner.invoke(args=['backfill-item-names', '--batch-size', '2'])
+        again = runner.invoke(args=['backfill-item-names'])
+        
+        assert result.exit_code == 0
+        assert 'Backfilled 5 order items' in result.output
+        assert 'Backfilled 0 order items' in again.output
+        for order_id in order_ids:
+            order = json.loads(client.get(f'/api/orders/{order_id}').data)
+            assert order['items'][0]['product_name'] == 'Test Product'
+
+
+class TestBatchAPI:
+    """Testy integracyjne wykonywania wielu operacji w jednym żądaniu."""
+    
+    def _pos_sequence(self, stock_change):
+        return [
+            {'method': 'POST', 'path': '/api/products',
+             'body': {'name': 'Kawa ziarnista', 'price': 45.0, 'stock': 0}},
+            {'method': 'PATCH', 'path': '/api/products/$0.id/stock',
+             'body': {'quantity_change': stock_change}},
+            {'method': 'POST', 'path': '/api/orders',
+             'body': {'customer_name': 'Jan Kowalski', 'customer_email': 'jan@example.com',
+                      'items': [{'product_id': '$0.id', 'quantity': 2}]}},
+            {'method': 'POST', 'path': '/api/orders/$2.id/confirm'},
+        ]
+    
+    def test_pos_sequence_runs_in_one_request(self, client):
+        """
+        TEST 60: Sekwencja kasy (produkt, dostawa, zamówienie, potwierdzenie) w jednym żądaniu.
+        
+        UZASADNIENIE BIZNESOWE:
+        Kasy w sklepach łączą się przez wolne łącza, a każde wywołanie API
+        to osobne opóźnienie sieci. Cała sekwencja idzie jednym żądaniem;
+        kolejne operacje korzystają z identyfikatorów nadanych przez
+        wcześniejsze, a każda dostaje swój status i odpowiedź.
+        """
+        response = client.post('/api/batch',
+            data=json.dumps({'operations': self._pos_sequence(10), 'atomic': True}),
+            content_type='application/json'
+        )
+        
+        assert response.status_code == 200
+        results = json.loads(response.data)['results']
+        assert [r['status'] for r in results] == [201, 200, 201, 200]
+        product_id, order_id = results[0]['body']['id'], results[2]['body']['id']
+        assert results[3]['body']['status'] == 'confirmed'
+        assert json.loads(client.get(f'/api/products/{product_id}').data)['stock'] == 8
+        assert json.loads(client.get(f'/api/orders/{order_id}').data)['status'] == 'confirmed'
+    
+    def test_atomic_batch_rolls_back_on_first_failure(self, client):
+        """
+        TEST 61: Przy błędzie jednej operacji batch atomowy nie zmienia niczego.
+        
+        SCENARIUSZ BIZNESOWY:
+        Kasa zamawia więcej sztuk, niż dotarło w dostawie. W trybie
+        atomowym nie może zostać produkt z dostawą bez zamówienia -
+        wycofane są wszystkie operacje, a odpowiedź wskazuje tę, która
+        zawiodła. Bez trybu atomowego operacje są niezależne, jak osobne
+        żądania.
+        """
+        operations = self._pos_sequence(1)
+        
+        atomic = client.post('/api/batch',
+            data=json.dumps({'operations': operations, 'atomic': True}),
+            content_type='application/json'
+        )
+        
+        assert atomic.status_code == 400
+        data = json.loads(atomic.data)
+        assert data['failed_operation'] == 2
+        assert [r['status'] for r in data['results']] == [201, 200, 400]
+        assert json.loads(client.get('/api/products').data) == []
+        
+        independent = client.post('/api/batch',
+            data=json.dumps({'operations': operations}),
+            content_type='application/json'
+        )
+        
+        assert independent.status_code == 200
+        results = json.loads(independent.data)['results']
+        assert [r['status'] for r in results] == [201, 200, 400, 400]
+        assert 'no successful result' in results[3]['body']['error']
+        assert json.loads(client.get('/api/products').data)[0]['stock'] == 1
+    
+    def test_unexpected_error_fails_only_its_operation(self, client, monkeypatch):
+        """
+        TEST 68: Nieobsłużony błąd operacji daje jej status 500, a nie błąd całego batcha.
+        
+        SCENARIUSZ BIZNESOWY:
+        Korekta stocku kończy się nieoczekiwanym wyjątkiem. Kasa musi
+        dostać wyniki pozostałych operacji - inaczej nie wie, które
+        zamówienia powstały. W trybie atomowym wycofane jest wszystko,
+        a odpowiedź wskazuje operację, która zawiodła.
+        """
+        from app.services import ProductService
+        
+        def fail(product_id, quantity_change):
+            raise RuntimeError('disk on fire')
+        
+        monkeypatch.setattr(ProductService, 'update_stock', staticmethod(fail))
+        operations = self._pos_sequence(10)[:2] + [
+            {'method': 'POST', 'path': '/api/products', 'body': {'name': 'Herbata', 'price': 20.0}},
+        ]
+        
+        atomic = client.post('/api/batch',
+            data=json.dumps({'operations': operations, 'atomic': True}),
+            content_type='application/json'
+        )
+        
+        assert atomic.status_code == 500
+        data = json.loads(atomic.data)
+        assert data['failed_operation'] == 1
+        assert data['results'][1] == {'status': 500, 'body': {'error': 'Internal server error'}}
+        assert json.loads(client.get('/api/products').data) == []
+        
+        independent = client.post('/api/batch',
+            data=json.dumps({'operations': operations}),
+            content_type='application/json'
+        )
+        
+        assert independent.status_code == 200
+        results = json.loads(independent.data)['results']
+        assert [r['status'] for r in results] == [201, 500, 201]
+        products = json.loads(client.get('/api/products').data)
+        assert sorted(p['name'] for p in products) == ['Herbata', 'Kawa ziarnista']
+
+
+class TestSchemaUpgrade:
+    """Testy integracyjne aktualizacji schematu istniejących baz."""
+    
+    BASELINE = [
+        """CREATE TABLE products (
+            id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(100) NOT NULL,
+            price FLOAT NOT NULL, stock INTEGER NOT NULL, created_at DATETIME
+        )""",
+        """CREATE TABLE orders (
+            id INTEGER NOT NULL PRIMARY KEY, customer_name VARCHAR(100) NOT NULL,
+            customer_email VARCHAR(120) NOT NULL, status VARCHAR(20),
+            total_amount FLOAT, created_at DATETIME
+        )""",
+        """CREATE TABLE order_items (
+            id INTEGER NOT NULL PRIMARY KEY, order_id INTEGER NOT NULL REFERENCES orders (id),
+            product_id INTEGER NOT NULL REFERENCES products (id), quantity INTEGER NOT NULL,
+            unit_price FLOAT NOT NULL, subtotal FLOAT NOT NULL
+        )""",
+        "INSERT INTO products VALUES (1, 'Laptop', 2500.0, 3, '2024-01-02 10:00:00.000000')",
+        "INSERT INTO orders VALUES (1, 'Jan Kowalski', 'jan@example.com', 'pending', "
+        "2500.0, '2024-01-03 10:00:00.000000')",
+        "INSERT INTO orders VALUES (2, 'Anna Nowak', 'anna@example.com', 'pending', "
+        "2500.0, '2024-01-03 11:00:00.000000')",
+        "INSERT INTO order_items VALUES (1, 1, 1, 1, 2500.0, 2500.0)",
+        "INSERT INTO order_items VALUES (2, 2, 1, 1, 2500.0, 2500.0)",
+    ]
+    
+    def _baseline_app(self, make_app, tmp_path):
+        import sqlite3
+        
+        path = tmp_path / 'baseline.db'
+        with sqlite3.connect(path) as connection:
+            for statement in self.BASELINE:
+                connection.execute(statement)
+        return make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}'), path
+    
+    def test_existing_database_gets_new_columns_and_indexes(self, make_app, tmp_path):
+        """
+        TEST 64: Baza z poprzedniej wersji dostaje przy starcie brakujące kolumny, indeksy i dane.
+        
+        UZASADNIENIE BIZNESOWE:
+        Aktualizacja aplikacji nie może wymagać ręcznych zmian w bazie
+        sklepu ani jej odtwarzania - istniejące produkty i zamówienia
+        zostają, a nowe funkcje działają od pierwszego uruchomienia.
+        """
+        from sqlalchemy import inspect
+        from app.models import db
+        
+        app, path = self._baseline_app(make_app, tmp_path)
+        # Second start: nothing left to add
+        make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+        
+        with app.app_context():
+            inspector = inspect(db.engine)
+            columns = {c['name'] for c in inspector.get_columns('products')}
+            indexes = {i['name'] for i in inspector.get_indexes('products')}
+        assert {'reorder_threshold', 'low_stock_since', 'version'} <= columns
+        assert 'ix_products_low_stock_since' in indexes
+        # Items of orders placed before the upgrade got their product names
+        order = json.loads(app.test_client().get('/api/orders/1').data)
+        assert order['items'][0]['product_name'] == 'Laptop'
+        
+        client = app.test_client()
+        response = client.patch('/api/products/1/stock',
+            data=json.dumps({'quantity_change': 2}),
+            content_type='application/json'
+        )
+        assert response.status_code == 200
+        assert json.loads(response.data)['stock'] == 5
+        response = client.post('/api/orders',
+            data=json.dumps({
+                'customer_name': 'Jan Kowalski',
+                'customer_email': 'jan@example.com',
+                'items': [{'product_id': 1, 'quantity': 1}]
+            }),
+            content_type='application/json'
+        )
+        assert response.status_code == 201
+        assert json.loads(response.data)['items'][0]['product_name'] == 'Laptop'
+    
+    def test_reports_of_existing_orders_are_filled_at_startup(self, make_app, tmp_path):
+        """
+        TEST 69: Raporty bazy z poprzedniej wersji obejmują zamówienia sprzed aktualizacji.
+        
+        UZASADNIENIE BIZNESOWE:
+        Tabele zbiorcze raportów powstają przy aktualizacji puste. Zmiana
+        statusu starego zamówienia odjęłaby je od pustego wiersza i raport
+        pokazałby ujemne liczby, dopóki ktoś ręcznie nie przeliczy raportów.
+        """
+        app, _ = self._baseline_app(make_app, tmp_path)
+        client = app.test_client()
+        
+        assert client.post('/api/orders/1/confirm').status_code == 200
+        assert client.post('/api/orders/2/cancel').status_code == 200
+        
+        by_status = json.loads(client.get('/api/reports/revenue-by-status').data)
+        assert [(r['status'], r['order_count'], r['revenue']) for r in by_status] == [
+            ('cancelled', 1, 2500.0), ('confirmed', 1, 2500.0)
+        ]
+        top = json.loads(client.get('/api/reports/top-products').data)
+        assert [(r['product_id'], r['units_sold']) for r in top] == [(1, 1)]
@@ -0,0 +1,221 @@
+"""
+Query plan tests - sprawdzają JAK baza wykonuje zapytania serwisów.
+
+Każdy test przechwytuje wszystkie instrukcje SQL wysłane przez endpoint,
+uruchamia dla nich EXPLAIN QUERY PLAN na zasilonej bazie (seeded_db) i
+sprawdza dwie rzeczy:
+- zapytania na gorącej ścieżce nie skanują całych tabel orders/order_items,
+- liczba instrukcji mieści się w budżecie endpointu (brak zapytań N+1).
+
+Brakujący indeks albo nowe leniwe ładowanie relacji wychodzi tu, a nie
+dopiero na produkcji.
+"""
+import json
+
+
+HOT_TABLES = ('orders', 'order_items')
+
+
+def assert_no_full_scans(recorder):
+    scans = recorder.full_scans(HOT_TABLES)
+    assert not scans, 'Full table scans:\n' + '\n'.join(
+        f'{detail}: {" ".join(statement.split())}' for statement, detail in scans
+    )
+
+
+def assert_statement_budget(recorder, budget):
+    count = len(recorder.statements)
+    assert count <= budget, f'{count} statements (budget {budget}):\n' + '\n'.join(
+        ' '.join(statement.split()) for statement, _ in recorder.statements
+    )
+
+
+class TestOrderReadQueryPlans:
+    """Plany zapytań odczytu zamówień."""
+
+    def test_get_order_uses_primary_key_and_item_index(self, client, seeded_db, query_recorder):
+        """
+        TEST 39: Pobranie zamówienia po ID nie skanuje tabel.
+
+        UZASADNIENIE BIZNESOWE:
+        Podgląd zamówienia to najczęstsze zapytanie (klient, obsługa, kurier).
+        Zamówienie musi być czytane po kluczu głównym, a pozycje po indeksie
+        order_id - jedno zapytanie na zamówienie i jedno na wszystkie pozycje.
+        """
+        order_id = seeded_db['orders_by_status']['pending'][0]
+
+        with query_recorder:
+            response = client.get(f'/api/orders/{order_id}')
+
+        assert response.status_code == 200
+        assert len(json.loads(response.data)['items']) == 3
+        assert_no_full_scans(query_recorder)
+        assert_statement_budget(query_recorder, 2)
+
+    def test_orders_by_status_use_status_index(self, client, seeded_db, query_recorder):
+        """
+        TEST 40: Filtrowanie zamówień po statusie korzysta z indeksu.
+
+        UZASADNIENIE BIZNESOWE:
+        Magazyn co chwilę pobiera listę zamówień "pending" do realizacji.
+        Bez indeksu na statusie każde odświeżenie czyta całą historię
+        zamówień, a pozycje zamówień nie mogą być ładowane osobno dla
+        każdego zamówienia (N+1).
+        """
+        pending = seeded_db['orders_by_status']['pending']
+
+        with query_recorder:
+            response = client.get('/api/orders?status=pending')
+
+        assert response.status_code == 200
+        assert len(json.loads(response.data)) == len(pending)
+        assert_no_full_scans(query_recorder)
+        assert_statement_budget(query_recorder, 2)
+
+    def test_order_list_statement_count_does_not_grow_with_orders(self, client, seeded_db, query_recorder):
+        """
+        TEST 41: Lista wszystkich zamówień to stała liczba zapytań.
+
+        UZASADNIENIE BIZNESOWE:
+        Pełna lista z natury czyta całą tabelę, ale 400 zamówień nie może
+        oznaczać 400 dodatkowych zapytań o pozycje i produkty.
+        """
+        with query_recorder:
+            response = client.get('/api/orders')
+
+        assert response.status_code == 200
+        assert len(json.loads(response.data)) == 400
+        assert_statement_budget(query_recorder, 2)
+
+
+class TestOrderWriteQueryPlans:
+    """Plany zapytań zmian zamówień."""
+
+    def test_create_order_stays_within_budget(self, client, seeded_db, query_recorder):
+        """
+        TEST 42: Złożenie zamówienia nie skanuje tabel zamówień.
+
+        UZASADNIENIE BIZNESOWE:
+        Składanie zamówień to główna ścieżka zapisu w szczycie sprzedaży.
+        Każde dodatkowe zapytanie wydłuża transakcję trzymającą blokadę zapisu.
+        """
+        product_ids = seeded_db['product_ids']
+
+        with query_recorder:
+            response = client.post('/api/orders',
+                data=json.dumps({
+                    'customer_name': 'Jan Kowalski',
+                    'customer_email': 'jan@example.com',
+                    'items': [
+                        {'product_id': product_ids[0], 'quantity': 1},
+                        {'product_id': product_ids[1], 'quantity': 2}
+                    ]
+                }),
+                content_type='application/json'
+            )
+
+        assert response.status_code == 201
+        assert_no_full_scans(query_recorder)
+        # Rezerwacja stocku to osobny UPDATE z kontrolą wersji na każdy produkt
+        assert_statement_budget(query_recorder, 12)
+
+    def test_confirm_and_cancel_order_use_indexes(self, client, seeded_db, query_recorder):
+        """
+        TEST 43: Potwierdzenie i anulowanie zamówienia nie skanują tabel.
+
+        UZASADNIENIE BIZNESOWE:
+        Anulowanie zwraca towar na stan, więc dotyka pozycji zamówienia.
+        Pozycje muszą być czytane po indeksie order_id, inaczej każde
+        anulowanie czyta wszystkie pozycje w sklepie.
+        """
+        pending = seeded_db['orders_by_status']['pending']
+
+        with query_recorder:
+            response = client.post(f'/api/orders/{pending[0]}/confirm')
+        assert response.status_code == 200
+        assert_no_full_scans(query_recorder)
+        assert_statement_budget(query_recorder, 8)
+
+        with query_recorder:
+            response = client.post(f'/api/orders/{pending[1]}/cancel')
+        assert response.status_code == 200
+        assert_no_full_scans(query_recorder)
+        assert_statement_budget(query_recorder, 10)
+
+    def test_bulk_cancel_statement_count_does_not_grow_with_orders(self, client, seeded_db, query_recorder):
+        """
+        TEST 44: Masowe anulowanie to stała liczba zapytań.
+
+        SCENARIUSZ BIZNESOWY:
+        Obsługa anuluje kilkadziesiąt nieopłaconych zamówień naraz.
+        Zmiana statusu, zwrot towaru i aktualizacja raportów muszą iść
+        zbiorczo - liczba zapytań nie może rosnąć z liczbą zamówień.
+        """
+        pending = seeded_db['orders_by_status']['pending']
+
+        with query_recorder:
+            response = client.post('/api/orders/bulk/cancel',
+                data=json.dumps({'order_ids': pending[:40]}),
+                content_type='application/json'
+            )
+
+        assert response.status_code == 200
+        assert len(json.loads(response.data)['transitioned']) == len(pending[:40])
+        assert_no_full_scans(query_recorder)
+        assert_statement_budget(query_recorder, 8)
+
+
+
+class TestReportQueryPlans:
+    """Plany zapytań raportów."""
+
+    def test_revenue_by_status_reads_running_totals(self, app, client, seeded_db, query_recorder):
+        """
+        TEST 63: Przychód per status to jedno zapytanie do sum bieżących, nie do dni.
+
+        UZASADNIENIE BIZNESOWE:
+        Pulpit finansowy odświeża ten raport co chwilę. Sumowanie wszystkich
+        dni historii przy każdym odczycie zwalniałoby z każdym dniem pracy
+        sklepu - sumy per status są utrzymywane na bieżąco.
+        """
+        from app.services import ReportService
+
+        with app.app_context():
+            ReportService.rebuild_rollups()
+
+        with query_recorder:
+            response = client.get('/api/reports/revenue-by-status')
+
+        assert response.status_code == 200
+        assert sum(r['order_count'] for r in json.loads(response.data)) == 400
+        assert_statement_budget(query_recorder, 1)
+        assert all('daily_revenue' not in statement for statement, _ in query_recorder.statements)
+
+class TestReservationExpiryQueryPlans:
+    """Plany zapytań wygaszania rezerwacji."""
+
+    def test_expiry_finds_stale_orders_through_index(self, app, seeded_db, query_recorder):
+        """
+        TEST 49: Wygaszanie przeterminowanych zamówień nie skanuje tabel.
+
+        UZASADNIENIE BIZNESOWE:
+        Sweeper co minutę szuka zamówień "pending" starszych niż czas
+        rezerwacji. Musi je znaleźć po indeksie (status, created_at), a każda
+        partia - niezależnie od liczby zamówień i pozycji - to stała liczba
+        zapytań, z jednym zwrotem stocku na produkt.
+        """
+        from datetime import datetime, timedelta
+        from app.services import OrderService
+
+        pending = seeded_db['orders_by_status']['pending']
+
+        with app.app_context(), query_recorder:
+            result = OrderService.expire_stale_orders(
+                datetime.utcnow() + timedelta(minutes=1), batch_size=40
+            )
+
+        assert result['expired'] == len(pending)
+        assert result['batches'] == -(-len(pending) // 40)
+        assert sum(result['released'].values()) == 3 * len(pending)
+        assert_no_full_scans(query_recorder)
+        assert_statement_budget(query_recorder, 9 * result['batches'])
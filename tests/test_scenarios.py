@@ -260,3 +260,83 @@ class TestDataValidationScenarios:
         
         assert response.status_code == 400
         assert 'email' in response.get_json()['error'].lower()
+
+
+class TestSalesReportingScenarios:
+    """Scenariusze raportów sprzedaży opartych na tabelach zbiorczych."""
+    
+    def test_reports_follow_order_lifecycle(self, client, sample_products, place_order):
+        """
+        TEST 32: Raporty przychodów i sprzedaży produktów śledzą cykl życia zamówień.
+        
+        SCENARIUSZ BIZNESOWY:
+        1. Dwa zamówienia trafiają do systemu (pending)
+        2. Pierwsze zostaje potwierdzone i dostarczone
+        3. Drugie zostaje anulowane
+        
+        Dział finansów widzi przychód w podziale na statusy, a anulowane
+        sztuki nie są liczone jako sprzedane - bez eksportu wszystkich zamówień.
+        """
+        laptop_id, mouse_id, _ = sample_products
+        delivered = place_order(client, {laptop_id: 1, mouse_id: 2})
+        cancelled = place_order(client, {mouse_id: 3})
+        
+        pending = client.get('/api/reports/revenue-by-status').get_json()
+        assert pending == [{'status': 'pending', 'order_count': 2, 'revenue': 2750.0}]
+        
+        client.post(f'/api/orders/{delivered}/confirm')
+        client.post(f'/api/orders/{delivered}/complete')
+        client.post('/api/orders/bulk/cancel',
+            data=json.dumps({'order_ids': [cancelled]}),
+            content_type='application/json'
+        )
+        
+        by_status = client.get('/api/reports/revenue-by-status').get_json()
+        assert by_status == [
+            {'status': 'cancelled', 'order_count': 1, 'revenue': 150.0},
+            {'status': 'completed', 'order_count': 1, 'revenue': 2600.0},
+        ]
+        top = client.get('/api/reports/top-products').get_json()
+        assert top == [
+            {'product_id': mouse_id, 'units_sold': 2, 'revenue': 100.0},
+            {'product_id': laptop_id, 'units_sold': 1, 'revenue': 2500.0},
+        ]
+        daily = client.get('/api/reports/daily-revenue?status=completed').get_json()
+        assert len(daily) == 1 and daily[0]['revenue'] == 2600.0
+    
+    def test_rebuild_matches_incremental_rollups(self, app, client, sample_products, place_order):
+        """
+        TEST 33: Przebudowa tabel zbiorczych od zera daje te same wyniki co aktualizacje przyrostowe.
+        
+        SCENARIUSZ BIZNESOWY:
+        Po awarii lub zmianie definicji raportu administrator przelicza raporty
+        komendą `flask rebuild-rollups`. Wynik musi być identyczny z tym,
+        co system utrzymywał na bieżąco.
+        """
+        laptop_id, mouse_id, _ = sample_products
+        first = place_order(client, {laptop_id: 2})
+        second = place_order(client, {mouse_id: 4})
+        place_order(client, {mouse_id: 1})
+        client.post('/api/orders/bulk/confirm',
+            data=json.dumps({'order_ids': [first, second]}),
+            content_type='application/json'
+        )
+        client.post(f'/api/orders/{second}/complete')
+        
+        incremental = (
+            client.get('/api/reports/daily-revenue').get_json(),
+            client.get('/api/reports/top-products').get_json(),
+            client.get('/api/reports/revenue-by-status').get_json(),
+        )
+        result = app.test_cli_runner().invoke(args=['rebuild-rollups'])
+        rebuilt = (
+            client.get('/api/reports/daily-revenue').get_json(),
+            client.get('/api/reports/top-products').get_json(),
+            client.get('/api/reports/revenue-by-status').get_json(),
+        )
+        
+        assert result.exit_code == 0
+        assert rebuilt == incremental
+        assert {r['status']: r['order_count'] for r in rebuilt[0]} == {
+            'completed': 1, 'confirmed': 1, 'pending': 1
+        }
@@ -39,6 +39,25 @@ class TestProductModel:
             
             assert product.is_available(6) is False
             assert product.is_available(100) is False
+    
+    def test_product_low_stock_uses_own_or_default_threshold(self, app):
+        """
+        TEST 34: Produkt jest "na wyczerpaniu" poniżej własnego progu lub progu domyślnego.
+        
+        UZASADNIENIE BIZNESOWE:
+        Dział zakupów ustala próg zamówienia osobno dla każdego produktu
+        (np. 20 szt. dla myszek, 2 szt. dla laptopów). Produkt bez własnego
+        progu korzysta z progu domyślnego, a bez żadnego progu nie jest śledzony.
+        """
+        with app.app_context():
+            own = Product(name='Mysz', price=10.0, stock=15, reorder_threshold=20)
+            default_only = Product(name='Kabel', price=5.0, stock=3)
+            
+            assert own.is_low_stock() is True
+            assert own.is_low_stock(default_threshold=5) is True
+            assert default_only.is_low_stock() is False
+            assert default_only.is_low_stock(default_threshold=5) is True
+            assert default_only.is_low_stock(default_threshold=3) is False
 
 
 class TestOrderModel: